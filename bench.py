@@ -0,0 +1,689 @@
+__author__ = "Shane Drabing"
+__license__ = "MIT"
+__email__ = "shane.drabing@gmail.com"
+
+
+# IMPORTS
+
+
+import functools
+import time
+
+
+# FUNCTIONS
+
+
+def timeit(f, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling(title, f, sizes, setup=None):
+    # setup(n) builds the input outside of the timer
+    print(title)
+    print("{:>10}  {:>10}  {:>12}".format("n", "seconds", "seconds / n"))
+    for n in sizes:
+        sec = timeit(f, n if setup is None else setup(n))
+        print("{:>10}  {:>10.4f}  {:>12.3e}".format(n, sec, sec / n))
+    print()
+
+
+# C(OMBINE), PIECES AND SIZE
+
+
+if True and __name__ == "__main__":
+    from pyrat.base import c, isnonstriter, vector
+
+    def c_reduce(*itr):
+        # the old quadratic implementation, for reference
+        vec = vector(c_reduce(*x) if isnonstriter(x) else (x,) for x in itr)
+        return vector(vec.astype(tuple).reduce(tuple.__add__, tuple()))
+
+    def pieces(f):
+        def piecesf(n):
+            return f(*(c(float(i)) for i in range(n)))
+        return piecesf
+
+    def size(n):
+        return c(c(range(n)), c(range(n)))
+
+    sizes = (1000, 2000, 4000, 8000)
+    scaling("c, number of pieces", pieces(c), sizes)
+    scaling("c (reduce), number of pieces", pieces(c_reduce), sizes)
+    scaling("c, total size", size, (10 ** 5, 10 ** 6, 10 ** 7))
+    scaling("c, mixed pieces", pieces(functools.partial(c, "x")), sizes)
+
+
+# LAZY, FUSED OPERATOR CHAINS
+
+
+if True and __name__ == "__main__":
+    from pyrat.base import seq
+
+    def floats(n):
+        return seq(n) * 1.0
+
+    def eager(x):
+        return sum(((x - 1) * 2 + 1) ** 2)
+
+    def fused(x):
+        return sum(((x.lazy() - 1) * 2 + 1) ** 2)
+
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("sum of squares, eager", eager, sizes, floats)
+    scaling("sum of squares, lazy", fused, sizes, floats)
+
+
+# BACKENDS
+
+
+if True and __name__ == "__main__":
+    from pyrat.backend import backends, set_backend
+    from pyrat.base import order, seq, sqrt
+    from pyrat.stats import var
+
+    def floats(n):
+        return seq(n) * 0.5
+
+    def arith(x):
+        return sqrt(x * x + 1) < 100
+
+    def ordering(x):
+        return order(x % 7)
+
+    sizes = (10 ** 5, 10 ** 6)
+    for name in backends():
+        set_backend(name)
+        scaling("arithmetic, {}".format(name), arith, sizes, floats)
+        scaling("order, {}".format(name), ordering, sizes, floats)
+        scaling("var, {}".format(name), var, sizes, floats)
+
+
+# REGEX
+
+
+if True and __name__ == "__main__":
+    import re
+
+    from pyrat.base import grepl, gsub, paste, seq
+
+    def lines(n):
+        return paste("line", seq(n), "of the log")
+
+    def grepl_old(x):
+        return x.apply(re.compile(r"1\d").search)
+
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("per-element apply", grepl_old, sizes, lines)
+    scaling("grepl", lambda x: grepl(r"1\d", x), sizes, lines)
+    scaling("gsub", lambda x: gsub(r"\d", "#", x), sizes, lines)
+    scaling("gsub, 4 workers", lambda x: gsub(r"\d", "#", x, workers=4),
+            sizes, lines)
+
+
+# COMPACT SEQ AND REP
+
+
+if True and __name__ == "__main__":
+    from pyrat.base import c, mean, rep, rsum, seq, vector
+
+    def materialized(n):
+        return vector(tuple(seq(n)))
+
+    sizes = (10 ** 5, 10 ** 6, 10 ** 7)
+    scaling("seq", seq, sizes)
+    scaling("rep", lambda n: rep(c(1.5, 2.5), each=3, length_out=n), sizes)
+    scaling("mean of seq, compact", mean, sizes, seq)
+    scaling("mean of seq, materialized", mean, sizes, materialized)
+    scaling("rsum of rep", rsum, sizes, lambda n: rep(c(1, 2), length_out=n))
+
+
+# ORDER
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import order, vector
+    from pyrat.closure import get, nest
+
+    def order_old(x):
+        # the old implementation, for reference
+        srt = sorted(enumerate(x), key=nest(get(1), lambda v: v))
+        return vector(next(zip(*srt)))
+
+    def ints(n):
+        return vector(random.randrange(100) for _ in range(n))
+
+    def words(n):
+        return vector(random.choice("abcdefghij") * 3 for _ in range(n))
+
+    def floats(n):
+        return vector(random.random() for _ in range(n))
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("order (old), int", order_old, sizes, ints)
+    scaling("order, int", order, sizes, ints)
+    scaling("order (old), str", order_old, sizes, words)
+    scaling("order, str", order, sizes, words)
+    scaling("order (old), float", order_old, sizes, floats)
+    scaling("order, float", order, sizes, floats)
+    scaling("order, str and int", lambda x: order(*x), sizes,
+            lambda n: (words(n), ints(n)))
+
+
+# TAPPLY
+
+
+if True and __name__ == "__main__":
+    import itertools
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import order, rsum, seq, tapply, vector
+
+    def tapply_old(x, index, f):
+        # the old sort and groupby implementation, for reference
+        ind = order(index)
+        grp = itertools.groupby(seq(0, len(x))[ind], index.__getitem__)
+        return {k: f(x[v]) for k, v in grp}
+
+    def groups(n):
+        x = vector(random.random() for _ in range(n))
+        return x, vector(random.randrange(1000) for _ in range(n))
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("tapply (old), rsum", lambda a: tapply_old(*a, rsum), sizes, groups)
+    scaling("tapply, rsum", lambda a: tapply(*a, rsum), sizes, groups)
+    scaling("tapply, sum", lambda a: tapply(*a, "sum"), sizes, groups)
+    scaling("tapply, var", lambda a: tapply(*a, "var"), sizes, groups)
+    scaling("tapply, rsum, 4 workers",
+            lambda a: tapply(*a, rsum, workers=4), sizes, groups)
+
+
+# TABLE AND DUPLICATED
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.base import duplicated, table, tabulate, tapply, vector
+
+    def ints(n):
+        return vector(random.randrange(1000) for _ in range(n))
+
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("tapply, len", lambda x: tapply(x, x, len), sizes, ints)
+    scaling("table", table, sizes, ints)
+    scaling("tabulate", tabulate, sizes, ints)
+    scaling("duplicated", duplicated, sizes, ints)
+
+
+# WORKER POOLS
+
+
+if True and __name__ == "__main__":
+    import concurrent.futures
+    import math
+
+    from pyrat import parallel
+    from pyrat.base import seq, vector
+
+    def proc_map_old(x):
+        # a fresh pool and a task per element, for reference
+        with concurrent.futures.ProcessPoolExecutor() as exe:
+            return vector(exe.map(math.sqrt, x))
+
+    def proc_map(x):
+        return x.proc_map(math.sqrt)
+
+    sizes = (10 ** 3, 10 ** 4)
+    scaling("proc_map (old)", proc_map_old, sizes, seq)
+    scaling("proc_map", proc_map, sizes, seq)
+    print("last call", parallel.last_stats(), end="\n\n")
+    parallel.shutdown()
+
+
+# SHARED MEMORY
+
+
+if True and __name__ == "__main__":
+    import math
+
+    from pyrat import parallel
+    from pyrat.base import seq, vector
+
+    def floats(n):
+        return seq(n) * 1.0
+
+    def pickled(x):
+        return vector(parallel.pmap(math.sqrt, x))
+
+    def shared(x):
+        return x.proc_map(math.sqrt)
+
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("serial apply", lambda x: x.apply(math.sqrt), sizes, floats)
+    scaling("proc_map, pickled chunks", pickled, sizes, floats)
+    scaling("proc_map, shared memory", shared, sizes, floats)
+    parallel.shutdown()
+
+
+# SLICES AND GATHERS
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import order, vector
+
+    def frame(n):
+        cols = [vector(random.random() for _ in range(n)) for _ in range(5)]
+        i = order(cols[0])
+        return cols, i, cols[0] > 0.5
+
+    def select(args):
+        # the pattern from scripts.py, every column
+        cols, i, b = args
+        return [v[i][b[i]] for v in cols]
+
+    def slices(args):
+        cols, _, _ = args
+        return [v[10:-10] for v in cols]
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("v[i][b[i]], 5 columns", select, sizes, frame)
+    scaling("v[10:-10], 5 columns", slices, sizes, frame)
+
+
+# ROLLING WINDOWS
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.base import mean, vector
+    from pyrat.stats import median
+    from pyrat.zoo import rollapply, rollmean, rollmedian
+
+    def floats(n):
+        return vector(random.random() for _ in range(n))
+
+    sizes = (10 ** 4, 10 ** 5)
+    for k in (10, 100):
+        scaling("rollapply mean, k = {}".format(k),
+                lambda x: rollapply(x, k, mean), sizes, floats)
+        scaling("rollmean, k = {}".format(k),
+                lambda x: rollmean(x, k), sizes, floats)
+        scaling("rollapply median, k = {}".format(k),
+                lambda x: rollapply(x, k, median), sizes, floats)
+        scaling("rollmedian, k = {}".format(k),
+                lambda x: rollmedian(x, k), sizes, floats)
+
+
+# PASTE
+
+
+if True and __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+
+    from pyrat.base import paste, sprintf, vector
+
+    def keys(n):
+        a = vector(random.randrange(1000) for _ in range(n))
+        return a, vector(random.choice("xyz") for _ in range(n))
+
+    def paste_old(*args, sep=" "):
+        # the old implementation, for reference
+        import itertools
+        vecs = tuple(x.astype(str) for x in args)
+        n = max(map(len, vecs))
+        vecs = (itertools.islice(itertools.cycle(x), n) for x in vecs)
+        return vector(map(sep.join, zip(*vecs)))
+
+    path = os.path.join(tempfile.gettempdir(), "pyrat_paste.txt")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("paste (old), key a b",
+            lambda x: paste_old(vector(["key"]), *x, sep="_"), sizes, keys)
+    scaling("paste, key a b", lambda x: paste("key", *x, sep="_"), sizes, keys)
+    scaling("sprintf, key a b", lambda x: sprintf("key_%d_%s", *x), sizes,
+            keys)
+    scaling("paste to a file", lambda x: paste("key", *x, file=path), sizes,
+            keys)
+    os.remove(path)
+
+
+# IFELSE AND CASE_WHEN
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import NA, _repeat, case_when, ifelse, log, vector
+
+    def ifelse_old(test, yes, no):
+        # the old implementation, both branches in full, for reference
+        pick = lambda t, a, b: a if t else b
+        return vector(map(pick, test, _repeat(yes), _repeat(no)))
+
+    def floats(n):
+        return vector(random.random() - 0.9 for _ in range(n))
+
+    def eager(x):
+        return ifelse_old(x > 0, log(x.apply(abs)), NA)
+
+    def lazy(x):
+        return ifelse(x > 0, log(x.lazy()), NA)
+
+    def grades(x):
+        return case_when(x < -0.5, "a", x < 0, "b", default="c")
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("ifelse (old), log of the positives", eager, sizes, floats)
+    scaling("ifelse, log of the positives", lazy, sizes, floats)
+    scaling("case_when, three cases", grades, sizes, floats)
+
+
+# MOMENTS
+
+
+if True and __name__ == "__main__":
+    import random
+    import tracemalloc
+
+    from pyrat.backend import set_backend
+    from pyrat.base import mean, rsum, sqrt, vector
+    from pyrat.stats import cor, dev, ss, var
+
+    def var_old(x):
+        # the old implementation, for reference: a pass for mean, one
+        # for the deviations, one for their squares
+        return ss(dev(x)) / (len(x) - 1)
+
+    def cor_old(x, y):
+        cov = rsum((x.lazy() - mean(x)) * (y.lazy() - mean(y))) / (len(x) - 1)
+        return cov / (sqrt(var_old(x)) * sqrt(var_old(y)))
+
+    def floats(n):
+        return vector(random.random() + 1e6 for _ in range(n))
+
+    def pairs(n):
+        x = floats(n)
+        return x, x * 2 + floats(n)
+
+    def peak(f, *args):
+        tracemalloc.start()
+        f(*args)
+        res = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return res
+
+    sizes = (10 ** 5, 10 ** 6)
+    for name in ("python", "numpy"):
+        set_backend(name)
+        scaling("var (old), {}".format(name), var_old, sizes, floats)
+        scaling("var, {}".format(name), var, sizes, floats)
+        scaling("cor (old), {}".format(name), lambda a: cor_old(*a), sizes,
+                pairs)
+        scaling("cor, {}".format(name), lambda a: cor(*a), sizes, pairs)
+    set_backend("python")
+    x, y = pairs(10 ** 6)
+    print("peak bytes, 10 ** 6 values")
+    line = "{} (old) {:>10}  {} {:>10}"
+    print(line.format("var", peak(var_old, x), "var", peak(var, x)))
+    print(line.format("cor", peak(cor_old, x, y), "cor", peak(cor, x, y)))
+    print()
+
+
+# ACCUMULATORS
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import c, vector
+    from pyrat.stats import accumulate, moments, var
+
+    def batches(n):
+        # n values arriving 10 ** 4 at a time
+        return [
+            vector(random.random() for _ in range(10 ** 4))
+            for _ in range(n // 10 ** 4)
+        ]
+
+    def recompute(parts):
+        # var of everything so far after each batch, from scratch
+        seen = list()
+        for x in parts:
+            seen.append(x)
+            var(c(*seen))
+
+    def incremental(parts):
+        acc = moments()
+        for x in parts:
+            acc.update(x).var()
+
+    set_backend("python")
+    sizes = (10 ** 5, 4 * 10 ** 5)
+    scaling("var after each batch, recomputed", recompute, sizes, batches)
+    scaling("var after each batch, moments", incremental, sizes, batches)
+    scaling("accumulate, 4 workers", lambda x: accumulate(x, workers=4),
+            (10 ** 6, 10 ** 7), lambda n: vector(range(n)) * 0.5)
+
+
+# MEDIAN AND QUANTILES
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import vector
+    from pyrat.stats import mad, median, quantile
+
+    def median_old(x):
+        # the old implementation, a full sort, for reference
+        srt = sorted(x)
+        i = len(srt) // 2
+        return sum(srt[i - 1:i + 1]) / 2 if len(srt) % 2 == 0 else srt[i]
+
+    def mad_old(x):
+        m = median_old(x)
+        return 1.4826 * median_old(abs(x - m))
+
+    def floats(n):
+        return vector(random.random() for _ in range(n))
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("median (old)", median_old, sizes, floats)
+    scaling("median", median, sizes, floats)
+    scaling("quantile, 5 probabilities", quantile, sizes, floats)
+    scaling("quantile, deciles", lambda x: quantile(x, [i / 10 for i in
+            range(11)]), sizes, floats)
+    scaling("mad (old)", mad_old, sizes, floats)
+    scaling("mad", mad, sizes, floats)
+
+
+# LINEAR MODELS
+
+
+if True and __name__ == "__main__":
+    import random
+    import tracemalloc
+
+    from pyrat.backend import set_backend
+    from pyrat.base import mean, vector
+    from pyrat.stats import cov, lm, predict, var
+
+    def lm_old(x, y):
+        # the old implementation, one predictor, for reference
+        b1 = cov(x, y) / var(x)
+        return {"b0": mean(y) - b1 * mean(x), "b1": b1}
+
+    def pair(n):
+        x = vector(random.random() for _ in range(n))
+        return x, x * 2 + vector(random.random() for _ in range(n))
+
+    def frame(n):
+        cols = {k: vector(random.random() for _ in range(n)) for k in "abcd"}
+        return cols, cols["a"] - cols["b"] + cols["c"] * 3
+
+    def peak(f, *args):
+        tracemalloc.start()
+        f(*args)
+        res = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return res
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("lm, 1 predictor (old)", lambda xy: lm_old(*xy), sizes, pair)
+    scaling("lm, 1 predictor", lambda xy: lm(*xy), sizes, pair)
+    scaling("lm, 4 predictors", lambda xy: lm(*xy), sizes, frame)
+
+    x, y = frame(10 ** 6)
+    model = lm(x, y)
+    whole = functools.partial(predict, model, x, chunksize=10 ** 6)
+    parts = functools.partial(predict, model, x)
+    print("predict peak, one piece: {:.1f} MB".format(peak(whole) / 1e6))
+    print("predict peak, chunked: {:.1f} MB".format(peak(parts) / 1e6))
+
+
+# GROUPED LINEAR MODELS
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import split, vector
+    from pyrat.stats import lm
+
+    def segments(n):
+        # n rows in 1000 groups
+        g = vector(random.randrange(1000) for _ in range(n))
+        x = vector(random.random() for _ in range(n))
+        return g, x, x * 2 + vector(random.random() for _ in range(n))
+
+    def by_split(gxy):
+        # what we did before, a split and a fit per group
+        g, x, y = gxy
+        xs, ys = split(x, g), split(y, g)
+        return {k: lm(xs[k], ys[k]) for k in xs}
+
+    def by_scan(gxy):
+        g, x, y = gxy
+        return lm(x, y, by=g)
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("lm per group, split and fit", by_split, sizes, segments)
+    scaling("lm per group, by=", by_scan, sizes, segments)
+
+
+# CORRELATION MATRICES
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import NA, c, vector
+    from pyrat.stats import cor
+
+    def frame(n):
+        # 10 columns of n rows
+        return {
+            k: vector(random.random() for _ in range(n)) for k in "abcdefghij"
+        }
+
+    def pairs(df):
+        # what we did before, a cor() per pair of columns
+        return {a: {b: cor(df[a], df[b]) for b in df} for a in df}
+
+    set_backend("python")
+    sizes = (10 ** 4, 10 ** 5)
+    scaling("cor of 10 columns, by pairs", pairs, sizes, frame)
+    scaling("cor of 10 columns, a frame", cor, sizes, frame)
+
+    def holes(n):
+        # the same, an NA in every column
+        df = frame(n)
+        return {k: c(NA, v[1:]) for k, v in df.items()}
+
+    scaling("cor of 10 columns with NA, pairwise.complete.obs",
+            lambda df: cor(df, use="pairwise.complete.obs"), sizes, holes)
+
+
+# QUANTILE SKETCH
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import vector
+    from pyrat.stats import median, sketch
+
+    def floats(n):
+        return vector(random.random() for _ in range(n))
+
+    def stream(x):
+        # the values in chunks, as from read_csv_chunks
+        acc = sketch()
+        for i in range(0, len(x), 10 ** 5):
+            acc.update(x[i:i + 10 ** 5])
+        return acc.median()
+
+    set_backend("python")
+    sizes = (10 ** 5, 10 ** 6)
+    scaling("median, exact", median, sizes, floats)
+    scaling("median, approx", lambda x: median(x, approx=True), sizes, floats)
+    scaling("sketch, in chunks of 10 ** 5", stream, sizes, floats)
+    acc = sketch(floats(10 ** 6))
+    print("sketch of 10 ** 6 values: {} items, {} bytes".format(
+        sum(map(len, acc.levels)), len(acc.tobytes())
+    ))
+
+
+# RESAMPLING
+
+
+if True and __name__ == "__main__":
+    import random
+
+    from pyrat.backend import set_backend
+    from pyrat.base import mean, vector
+    from pyrat.boot import boot
+
+    def floats(n):
+        return vector(random.random() for _ in range(n))
+
+    def loop(x):
+        # what we did before, a new vector per replicate
+        n = len(x)
+        return [mean(x[[random.randrange(n) for _ in range(n)]])
+                for _ in range(100)]
+
+    set_backend("python")
+    sizes = (10 ** 3, 10 ** 4)
+    scaling("100 resampled means, a loop", loop, sizes, floats)
+    scaling("100 resampled means, boot", lambda x: boot(x, mean, R=100),
+            sizes, floats)
+    scaling("100 resampled means, boot, 4 workers",
+            lambda x: boot(x, mean, R=100, workers=4), sizes, floats)
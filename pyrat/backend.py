@@ -0,0 +1,376 @@
+__author__ = "Shane Drabing"
+__license__ = "MIT"
+__email__ = "shane.drabing@gmail.com"
+
+
+# MODULE EXPOSURE
+
+
+__all__ = [
+    "backends",
+    "get_backend",
+    "set_backend",
+]
+
+
+# IMPORTS
+
+
+import array
+import math
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# CONSTANTS
+
+
+_CODES = {bool: "b", float: "d", int: "q"}
+_DTYPES = {bool: "int8", float: "float64", int: "int64"}
+
+_LOGICAL = {"eq", "ge", "gt", "le", "lt", "ne", "not_", "xor"}
+_DIVIDE = {"floordiv", "mod", "truediv"}
+
+# exactly representable integers, as float64 and as int64
+_EXACT = 2 ** 53
+_LIMIT = 2 ** 63
+
+# from 3.12 the builtin sum of floats is compensated, which no cumsum
+# reproduces, so float sums stay in Python there
+_COMPENSATED = sys.version_info >= (3, 12)
+
+
+# FUNCTIONS (CONVERSION)
+
+
+def _to_numpy(data, t):
+    try:
+        return np.asarray(memoryview(data))
+    except TypeError:
+        return np.fromiter(data, _DTYPES[t], len(data))
+
+
+def _to_array(res, t):
+    buf = array.array(_CODES[t])
+    buf.frombytes(np.ascontiguousarray(res, dtype=_DTYPES[t]).tobytes())
+    return buf
+
+
+def _operand(x, t, n):
+    if t is None:
+        return None
+    if isinstance(x, (bool, int, float)):
+        return np.asarray(x, dtype=_DTYPES[t])
+    arr = _to_numpy(x, t)
+    return arr if len(arr) == n else np.resize(arr, n)
+
+
+def _widen(x):
+    return x.astype("int64", copy=False) if x.dtype.kind == "i" else x
+
+
+def _maxabs(x):
+    if not x.size:
+        return 0
+    return max(-int(x.min()), int(x.max()))
+
+
+# FUNCTIONS (EXACTNESS)
+
+
+def _exact_binary(name, x, tx, y, ty):
+    # would numpy give what Python gives, error for error?
+    if name in _DIVIDE and not y.all():
+        return False
+    if name == "pow" and float in (tx, ty):
+        # numpy's float power and libm's pow differ in the last bit
+        return False
+    ints = tuple(a for a, t in ((x, tx), (y, ty)) if t is not float)
+    if len(ints) == 1:
+        return name not in _LOGICAL or _maxabs(ints[0]) <= _EXACT
+    if len(ints) == 0:
+        return True
+
+    mx, my = _maxabs(x), _maxabs(y)
+    if name in ("add", "sub"):
+        return mx + my < _LIMIT
+    if name == "mul":
+        return mx * my < _LIMIT
+    if name in ("floordiv", "mod"):
+        return mx < _LIMIT
+    if name == "truediv":
+        return mx <= _EXACT and my <= _EXACT
+    if name == "pow":
+        if y.size and int(y.min()) < 0:
+            return False
+        return mx <= 1 or my * math.log2(mx) < 62
+    return True
+
+
+def _exact_result(res, *args):
+    # Python raises where numpy quietly makes a new nan or inf
+    if res.dtype.kind != "f":
+        return True
+    args = tuple(np.broadcast_to(a, res.shape).astype("float64") for a in args)
+    nan = np.isnan(res) & ~np.logical_or.reduce([np.isnan(a) for a in args])
+    inf = np.isinf(res) & np.logical_and.reduce([np.isfinite(a) for a in args])
+    return not (nan.any() or inf.any())
+
+
+# BACKEND CLASSES
+
+
+class _Python:
+    # the pure-Python paths in pyrat.base are the reference,
+    # so every hook declines
+    name = "python"
+    native = False
+    threshold = 0
+
+    def binary(self, name, x, tx, y, ty, t, flip):
+        return None
+
+    def unary(self, key, x, tx, t):
+        return None
+
+    def reduce(self, name, x, tx):
+        return None
+
+    def which(self, x):
+        return None
+
+    def order(self, x, tx, reverse=False):
+        return None
+
+    def sort(self, x, tx, reverse=False):
+        return None
+
+    def ifelse(self, test, yes, tyes, no, tno, t):
+        return None
+
+    def moments(self, x, tx, y, ty, block):
+        return None
+
+    def select(self, x, tx, ks):
+        return None
+
+
+class _NumPy(_Python):
+    # hooks return a typed array.array, or None to fall back to Python
+    name = "numpy"
+    native = True
+    threshold = 1000
+
+    def binary(self, name, x, tx, y, ty, t, flip):
+        n = len(x)
+        if n < self.threshold or n == 0:
+            return None
+        ufunc = getattr(np, _UFUNCS.get(name, ""), None)
+        if ufunc is None:
+            return None
+        a, b = _operand(x, tx, n), _operand(y, ty, n)
+        if flip:
+            a, b, tx, ty = b, a, ty, tx
+        if name not in _LOGICAL:
+            a, b = (_widen(v) for v in (a, b))
+        if not _exact_binary(name, a, tx, b, ty):
+            return None
+        with np.errstate(all="ignore"):
+            res = ufunc(a, b)
+        if not _exact_result(res, a, b):
+            return None
+        return _to_array(np.broadcast_to(res, (n,)), t)
+
+    def unary(self, key, x, tx, t):
+        n = len(x)
+        if n < self.threshold or n == 0:
+            return None
+        name = key[0]
+        a = _to_numpy(x, tx)
+        if name in ("abs", "neg", "pos"):
+            a = _widen(a)
+            if tx is not float and _maxabs(a) >= _LIMIT:
+                return None
+            return _to_array(getattr(np, _UFUNCS[name])(a), t)
+        if name == "not_":
+            return _to_array(a == 0, t)
+
+        ufunc = getattr(np, _UFUNCS.get(name, ""), None)
+        if ufunc is None:
+            return None
+        a = a.astype("float64")
+        with np.errstate(all="ignore"):
+            res = ufunc(a)
+        if not _exact_result(res, a):
+            return None
+        return _to_array(res, t)
+
+    def reduce(self, name, x, tx):
+        n = len(x)
+        if n < self.threshold or n == 0:
+            return None
+        a = _to_numpy(x, tx)
+        if tx is float and np.isnan(a).any():
+            return None
+        if name == "sum":
+            if tx is not float and n * _maxabs(a) >= _LIMIT:
+                return None
+            if tx is not float:
+                return a.sum(dtype="int64").item()
+            if _COMPENSATED:
+                return None
+            # left to right, the same order as the builtin sum before 3.12
+            return np.cumsum(a)[-1].item()
+        if name in ("max", "min"):
+            res = getattr(a, name)().item()
+            return bool(res) if tx is bool else res
+        return None
+
+    def which(self, x):
+        if len(x) < self.threshold:
+            return None
+        return _to_array(np.flatnonzero(_to_numpy(x, bool)), int)
+
+    def order(self, x, tx, reverse=False):
+        n = len(x)
+        if n < self.threshold:
+            return None
+        a = _to_numpy(x, tx)
+        if tx is float and np.isnan(a).any():
+            return None
+        if not reverse:
+            return _to_array(np.argsort(a, kind="stable"), int)
+        # how sorted(..., reverse=True) keeps ties in their original order
+        ind = np.argsort(a[::-1], kind="stable")
+        return _to_array((n - 1 - ind)[::-1], int)
+
+    def sort(self, x, tx, reverse=False):
+        ind = self.order(x, tx, reverse)
+        if ind is None:
+            return None
+        return _to_array(_to_numpy(x, tx)[np.asarray(ind)], tx)
+
+    def ifelse(self, test, yes, tyes, no, tno, t):
+        n = len(test)
+        if n < self.threshold or n == 0:
+            return None
+        a = _operand(yes, tyes, n)
+        b = _operand(no, tno, n)
+        res = np.where(_to_numpy(test, bool) != 0, a, b)
+        return _to_array(np.broadcast_to(res, (n,)), t)
+
+    def moments(self, x, tx, y, ty, block):
+        # per block: count, mean, sum of squared deviations (for y too)
+        # and of cross products, each sum left to right like sum() before
+        # 3.12; the deviations are floats, so none of this from 3.12
+        n = len(x)
+        if n < self.threshold or n == 0 or _COMPENSATED:
+            return None
+        cols = list()
+        for a, t in ((x, tx), (y, ty)):
+            if a is None:
+                continue
+            a = _to_numpy(a, t)
+            if t is float and np.isnan(a).any():
+                return None
+            if t is not float and n * _maxabs(a) > _EXACT:
+                return None
+            cols.append(a.astype("float64"))
+
+        full = n - n % block
+        sizes = [block] * (full // block)
+        if n > full:
+            sizes.append(n - full)
+        sizes = np.array(sizes)
+
+        def sums(a):
+            heads = np.cumsum(a[:full].reshape(-1, block), axis=1)[:, -1]
+            return np.concatenate((heads, np.cumsum(a[full:])[-1:]))
+
+        out = [sizes]
+        devs = list()
+        for a in cols:
+            m = sums(a) / sizes
+            d = a - np.repeat(m, sizes)
+            out += [m, sums(d * d)]
+            devs.append(d)
+        if len(devs) == 2:
+            out.append(sums(devs[0] * devs[1]))
+        return list(zip(*(v.tolist() for v in out)))
+
+    def select(self, x, tx, ks):
+        # the values at sorted positions ks, by introselect
+        n = len(x)
+        if n < self.threshold or n == 0 or tx is None:
+            return None
+        a = _to_numpy(x, tx)
+        if tx is float and np.isnan(a).any():
+            return None
+        return np.partition(a, ks)[ks].tolist()
+
+
+_UFUNCS = {
+    # operators
+    "abs": "absolute",
+    "add": "add",
+    "eq": "equal",
+    "floordiv": "floor_divide",
+    "ge": "greater_equal",
+    "gt": "greater",
+    "le": "less_equal",
+    "lt": "less",
+    "mod": "remainder",
+    "mul": "multiply",
+    "ne": "not_equal",
+    "neg": "negative",
+    "pos": "positive",
+    "pow": "power",
+    "sub": "subtract",
+    "truediv": "true_divide",
+    "xor": "bitwise_xor",
+
+    # math, only sqrt: it is correctly rounded in both, numpy's exp, log
+    # and trigonometry differ from libm's in the last bit
+    "sqrt": "sqrt",
+}
+
+_BACKENDS = {
+    "numpy": _NumPy,
+    "python": _Python,
+}
+
+
+# FUNCTIONS (SELECTION)
+
+
+def backends():
+    if np is None:
+        return ["python"]
+    return sorted(_BACKENDS)
+
+
+def get_backend():
+    return active.name
+
+
+def set_backend(name, threshold=None):
+    global active
+    if name not in _BACKENDS:
+        raise ValueError("unknown backend: {}".format(name))
+    if name not in backends():
+        raise ImportError("backend needs {} installed".format(name))
+    active = _BACKENDS[name]()
+    if threshold is not None:
+        active.threshold = threshold
+    return active.name
+
+
+active = _Python()
+set_backend(os.environ.get(
+    "PYRAT_BACKEND", "python" if np is None else "numpy"
+))
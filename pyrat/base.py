@@ -20,8 +20,15 @@ __all__ = [
     "asin",
     "atan",
     "c",
+    "case_when",
     "cos",
+    "cummax",
+    "cummin",
+    "cumprod",
+    "cumsum",
+    "duplicated",
     "exp",
+    "force",
     "gextr",
     "gextrall",
     "grep",
@@ -31,9 +38,12 @@ __all__ = [
     "ifelse",
     "is_na",
     "is_none",
+    "isin",
     "isiter",
+    "islazy",
     "isnonstriter",
     "isvector",
+    "lazy",
     "log",
     "match",
     "mean",
@@ -43,11 +53,17 @@ __all__ = [
     "rep",
     "rmax",
     "rmin",
+    "rsum",
     "seq",
     "sin",
     "sort",
+    "sprintf",
+    "split",
     "sqrt",
+    "table",
+    "tabulate",
     "tan",
+    "tapply",
     "unique",
     "vector",
     "which",
@@ -57,16 +73,18 @@ __all__ = [
 # IMPORTS
 
 
-import concurrent.futures
+import array
+import collections
 import dataclasses
 import functools
 import itertools
 import math
 import operator as op
+import os
 import re
-import statistics
 
-from pyrat.closure import catch, get, inv, nest, part
+from pyrat import backend, parallel
+from pyrat.closure import catch, inv, part
 
 
 # NA CLASS
@@ -83,6 +101,10 @@ class _NA:
         # for itertools.compress?
         return False
 
+    def __reduce__(self):
+        # unpickle to the same NA, so identity checks keep working
+        return "NA"
+
 
 # PSEUDO-CONSTANTS
 
@@ -93,6 +115,15 @@ F = False
 Inf = float("inf")
 NaN = float("nan")
 
+_TYPECODES = {bool: "b", float: "d", int: "q"}
+_TYPES = {v: k for k, v in _TYPECODES.items()}
+_COMPARISONS = (op.eq, op.ge, op.gt, op.le, op.lt, op.ne)
+_SCALARS = {bool, complex, float, int, str, type(None), _NA}
+
+# typed buffers hold a harmless value under NA, valid masks use 1 / 0
+_PLACEHOLDER = {bool: False, float: 1.0, int: 1}
+_FLIP = bytes.maketrans(b"\x00\x01", b"\x01\x00")
+
 
 # FUNCTIONS (GENERAL)
 
@@ -116,16 +147,17 @@ def _repeat(x):
     return itr
 
 
-def _repeat_many(itr):
-    try:
-        maxlen = max(map(len, itr))
-    except ValueError:
-        return tuple()
-    return tuple(itertools.islice(_repeat(x), maxlen) for x in itr)
-
-
-def _ifelse_singular(test, yes, no):
-    return yes if test else no
+def _result_type(f, *types):
+    if f in _COMPARISONS or f is op.not_:
+        return bool
+    if f is op.xor:
+        if float in types:
+            return None
+        if all(t is bool for t in types):
+            return bool
+    if f is op.truediv or float in types:
+        return float
+    return int
 
 
 def _rlog(x, base):
@@ -148,12 +180,29 @@ def isvector(x):
     return isinstance(x, vector)
 
 
+def islazy(x):
+    return isinstance(x, lazy)
+
+
 # FUNCTIONS (STATISTICS)
 
 
-def _stat(f, x):
+def _stat(f, x, key=None):
+    if key is None:
+        key = (f.__name__,)
+    if islazy(x):
+        def statf(x):
+            return _stat(f, x, key)
+        return lazy._node(f, (x,), na_safe(f), float, statf)
     if not isvector(x):
         return f(x)
+    if x._type is not None:
+        buf = backend.active.unary(key, x._data, x._type, float)
+        if buf is not None:
+            return _native(float, buf, x._valid)
+        vec = _typed(float, map(f, x._data), x._valid)
+        if vec is not None:
+            return vec
     return x.apply(na_safe(f))
 
 
@@ -190,9 +239,9 @@ def atan(x):
 
 
 def log(x, base=math.exp(1)):
-    if not isvector(x):
+    if not isvector(x) and not islazy(x):
         return _rlog(x, base)
-    return x.apply(na_safe(part(_rlog, base)))
+    return _stat(part(_rlog, base), x, ("log", base))
 
 
 def log2(x):
@@ -207,26 +256,79 @@ def log1p(x):
     return log(1 + x)
 
 
+def _reduce(name, f, x):
+    if x._type is not None and x._valid is None:
+        # compact storage knows the answer without a pass over the data
+        shortcut = getattr(x._data, name, None)
+        res = backend.active.reduce(name, x._data, x._type) \
+            if shortcut is None else shortcut()
+        if res is not None:
+            return bool(res) if x._type is bool and name != "sum" else res
+    return f(x)
+
+
 def rmin(*x, na_rm=False):
-    x = c(x)
+    x = c(*x)
     if not x:
         return Inf
-    if na_rm:
-        x = x.filter(inv(is_na))
-    elif any(is_na(x)):
+    if na_rm and x._valid is not None:
+        x = x[~is_na(x)]
+    elif any_na(x):
         return NA
-    return min(x)
+    return _reduce("min", min, x)
 
 
 def rmax(*x, na_rm=False):
-    x = c(x)
+    x = c(*x)
     if not x:
         return -Inf
-    if na_rm:
-        x = x.filter(inv(is_na))
-    elif any(is_na(x)):
+    if na_rm and x._valid is not None:
+        x = x[~is_na(x)]
+    elif any_na(x):
+        return NA
+    return _reduce("max", max, x)
+
+
+def rsum(*x, na_rm=False):
+    if len(x) == 1 and islazy(x[0]):
+        x, = x
+        if not _lazy_native(x) and _mask(x, len(x)) is None:
+            # stream the fused expression, nothing is materialized
+            return sum(x)
+        x = (x.force(),)
+    x = c(*x)
+    if na_rm and x._valid is not None:
+        x = x[~is_na(x)]
+    elif any_na(x):
         return NA
-    return max(x)
+    return _reduce("sum", sum, x)
+
+
+def _cumulative(f, x):
+    # like R, everything from the first NA on is NA
+    if not isvector(x):
+        x = c(x)
+    n = len(x)
+    k = n if x._valid is None else x._valid.find(0)
+    data = tuple(x) if x._type is None else x._data
+    vals = list(itertools.accumulate(itertools.islice(data, k), f))
+    return vector(vals + [NA] * (n - k))
+
+
+def cumsum(x):
+    return _cumulative(op.add, x)
+
+
+def cumprod(x):
+    return _cumulative(op.mul, x)
+
+
+def cummax(x):
+    return _cumulative(max, x)
+
+
+def cummin(x):
+    return _cumulative(min, x)
 
 
 def mean(x, na_rm=False):
@@ -234,29 +336,80 @@ def mean(x, na_rm=False):
         return NA
     if not isvector(x):
         x = c(x)
-    if na_rm:
-        x = x.filter(inv(is_na))
-    elif any(is_na(x)):
+    if na_rm and x._valid is not None:
+        x = x[~is_na(x)]
+    elif any_na(x):
         return NA
-    return sum(x) / len(x)
+    return _reduce("sum", sum, x) / len(x)
 
 
 # FUNCTIONS (VECTOR MANIPULATION)
 
 
+def _flatten(itr, out):
+    for x in itr:
+        if type(x) in _SCALARS:
+            out.append(x)
+        elif isvector(x) and x._type is not None:
+            out.extend(x)
+        elif isnonstriter(x):
+            _flatten(x, out)
+        else:
+            out.append(x)
+    return out
+
+
+def _concat(t, itr):
+    buf = array.array(_TYPECODES[t])
+    try:
+        for x in itr:
+            if isvector(x):
+                buf.extend(x._data)
+            else:
+                buf.append(x)
+    except OverflowError:
+        return None
+
+    valid = None
+    if any(isvector(x) and x._valid is not None for x in itr):
+        valid = b"".join(
+            (x._valid or b"\x01" * len(x)) if isvector(x) else b"\x01"
+            for x in itr
+        )
+    return vector._new(buf, t, valid)
+
+
 def c(*itr):
-    vec = vector(c(*x) if isnonstriter(x) else (x,) for x in itr)
-    return vector(vec.astype(tuple).reduce(tuple.__add__, tuple()))
+    if any(map(islazy, itr)):
+        # the values of lazy nodes, not the nodes
+        itr = tuple(map(force, itr))
+    if len(itr) == 1 and isvector(itr[0]):
+        x, = itr
+        if x._type is not None or set(map(type, x._data)) <= _SCALARS:
+            return x
+
+    types = set(map(_type_of, itr))
+    if len(types) == 1 and None not in types:
+        vec = _concat(types.pop(), itr)
+        if vec is not None:
+            return vec
+
+    return vector(_flatten(itr, list()))
 
 
 def is_na(x):
     if isvector(x):
-        return x.apply(is_na)
+        if x._valid is None:
+            mask = bytes(len(x))
+        else:
+            mask = x._valid.translate(_FLIP)
+        return vector._new(array.array("b", mask), bool)
     return _is_na_singular(x)
 
 
 def any_na(*x):
-    return any(is_na(c(x)))
+    # piece by piece, the pieces are not joined
+    return any(c(v)._valid is not None for v in x)
 
 
 def is_none(x):
@@ -265,6 +418,12 @@ def is_none(x):
     return _is_none_singular(x)
 
 
+def force(x):
+    if islazy(x):
+        return x.force()
+    return x
+
+
 def na_safe(f, err=TypeError, default=NA):
     f = catch(f, err, default)
     def na_safef(*x):
@@ -297,11 +456,15 @@ def rep(x=None, times=None, length_out=None, each=None):
         times = 1
     if length_out is None:
         length_out = len(x) * times * each
-    itr = x if isnonstriter(x) else c(x)
-    gen = map(part(itertools.repeat, each), itr)
-    chn = itertools.chain.from_iterable(gen)
-    cyc = itertools.cycle(chn)
-    return vector(itertools.islice(cyc, length_out))
+    if not isvector(x):
+        x = vector(x)
+    if not x or not length_out:
+        return vector()
+    if x._valid is not None:
+        gen = map(part(itertools.repeat, each), x)
+        cyc = itertools.cycle(itertools.chain.from_iterable(gen))
+        return vector(itertools.islice(cyc, length_out))
+    return vector._new(_Rep(x._data, each, range(length_out)), x._type)
 
 
 def seq(start, end=None, step=1, length_out=None):
@@ -318,37 +481,365 @@ def seq(start, end=None, step=1, length_out=None):
         length_out = math.ceil(nsteps) + (nsteps == int(nsteps))
     else:
         step = (rng / (length_out - 1))
-    vec = vector(start + (step * i) for i in range(length_out))
+    t = type(start + step * 0)
+    if t in (float, int):
+        vec = vector._new(_Seq(start, step, range(length_out)), t)
+    else:
+        vec = vector(start + (step * i) for i in range(length_out))
     return vec[::-1] if flip else vec
 
 
-def sort(itr, key=None, reverse=False):
-    return vector(sorted(itr, key=key, reverse=reverse))
+def _native_sortable(x, key):
+    return key is None and isvector(x) and x._type is not None \
+        and x._valid is None
 
 
-def order(itr=None, key=None, reverse=False):
-    if itr is None:
+def _levels(vals):
+    # dense ranks for few distinct values, like the levels of a factor
+    try:
+        # a prefix is enough to turn away mostly distinct values
+        head = vals[:4096]
+        if len(set(head)) * 4 > len(head):
+            return None
+        levels = set(vals)
+    except TypeError:
+        return None
+    if len(levels) * 4 > len(vals):
+        return None
+    levels = sorted(levels)
+    codes = map(dict(zip(levels, range(len(levels)))).__getitem__, vals)
+    return list(codes), len(levels)
+
+
+def _order_key(x, key, decreasing, na_last):
+    # (codes, span), ints in range(span) that sort the way x should,
+    # or (values, None) when only a comparison sort will do
+    valid = x._valid
+    if key is None and x._type in (bool, int):
+        data = x._data
+        lo, hi = (min(data), max(data)) if data else (0, -1)
+        if decreasing:
+            codes = list(map(op.sub, itertools.repeat(hi), data))
+        else:
+            codes = list(map(op.sub, data, itertools.repeat(lo)))
+        span = hi - lo + 1
+    else:
+        vals = x if valid is None else itertools.compress(x, valid)
+        vals = list(vals if key is None else map(key, vals))
+        res = _levels(vals)
+        if res is None:
+            if key is None and x._type is not None:
+                return x._data, None
+            return _unsplit(vals, valid, NA), None
+        codes, span = res
+        if decreasing:
+            codes = list(map(op.sub, itertools.repeat(span - 1), codes))
+        codes = _unsplit(codes, valid, 0)
+    if valid is None:
+        return codes, span
+    if na_last is False:
+        codes = list(map(op.add, codes, itertools.repeat(1)))
+    for i in _na_positions(valid):
+        codes[i] = 0 if na_last is False else span
+    return codes, span + 1
+
+
+def _order_pass(rows, codes, span):
+    # stable, counting sort when the codes come from a small range
+    if span * 4 > len(rows):
+        return sorted(rows, key=codes.__getitem__)
+    buckets = [list() for _ in range(span)]
+    appends = [b.append for b in buckets]
+    for i in rows:
+        appends[codes[i]](i)
+    return list(itertools.chain.from_iterable(buckets))
+
+
+def _order_values(rows, vals, valid, decreasing, na_last):
+    # stable comparison sort, NA kept out of the comparisons
+    if valid is None:
+        return sorted(rows, key=vals.__getitem__, reverse=decreasing)
+    ok = tuple(map(valid.__getitem__, rows))
+    srt = sorted(
+        itertools.compress(rows, ok), key=vals.__getitem__, reverse=decreasing
+    )
+    na = list(itertools.compress(rows, map(op.not_, ok)))
+    return srt + na if na_last else na + srt
+
+
+def sort(itr, key=None, reverse=False, decreasing=False, na_last=None):
+    if _native_sortable(itr, key):
+        buf = backend.active.sort(itr._data, itr._type, reverse or decreasing)
+        if buf is not None:
+            return vector._new(buf, itr._type)
+    if not isvector(itr):
+        itr = vector(itr)
+    ind = order(
+        itr, key=key, reverse=reverse, decreasing=decreasing, na_last=na_last
+    )
+    return itr[ind]
+
+
+def order(*x, key=None, reverse=False, decreasing=False, na_last=True):
+    # stable, the first key first, ties broken by the next;
+    # na_last puts NA at the end, True, the start, False, or drops it, None
+    if not x:
         return
-    if key is None:
-        key = _identity
-    srt = sorted(enumerate(itr), key=nest(get(1), key), reverse=reverse)
-    ind, _ = zip(*srt)
-    return vector(ind)
+    x = tuple(v if isvector(v) else vector(v) for v in x)
+    n = len(x[0])
+    if any(len(v) != n for v in x):
+        raise ValueError("argument lengths differ")
+    if isinstance(decreasing, bool):
+        decreasing = (decreasing or reverse,) * len(x)
+    elif len(decreasing) != len(x):
+        raise ValueError("decreasing needs one value per argument")
+
+    if len(x) == 1 and _native_sortable(x[0], key):
+        buf = backend.active.order(x[0]._data, x[0]._type, decreasing[0])
+        if buf is not None:
+            return vector._new(buf, int)
+
+    valid = _mask_and(*(v._valid for v in x))
+    if na_last is None and valid is not None:
+        # drop incomplete rows before ranking
+        rows = vector._new(array.array("b", valid), bool)
+        keep = which(rows)
+        x = tuple(_compress(v, rows) for v in x)
+        return keep[order(*x, key=key, decreasing=decreasing)]
+
+    # mixed radix codes, each key a digit, merged until a key needs
+    # comparisons; the passes then run last key first, like LSD radix sort
+    passes, codes, span = list(), None, 1
+    for v, dec in zip(x, decreasing):
+        k, s = _order_key(v, key, dec, na_last)
+        if s is None:
+            if codes is not None:
+                passes.append((codes, span))
+            passes.append((k, v._valid, dec))
+            codes, span = None, 1
+        elif codes is None:
+            codes, span = k, s
+        else:
+            codes = map(op.mul, codes, itertools.repeat(s))
+            codes = list(map(op.add, codes, k))
+            span *= s
+    if codes is not None:
+        passes.append((codes, span))
+
+    if len(passes) == 1 and len(passes[0]) == 2 and backend.active.native \
+            and span < 2 ** 63:
+        buf = backend.active.order(array.array("q", codes), int)
+        if buf is not None:
+            return vector._new(buf, int)
+    rows = range(n)
+    for p in reversed(passes):
+        if len(p) == 2:
+            rows = _order_pass(rows, *p)
+        else:
+            rows = _order_values(rows, *p, na_last)
+    return vector._new(array.array("q", rows), int)
+
+
+def _recycle(x, n):
+    # x as n values, without building the copies
+    if len(x) == n:
+        return x
+    return itertools.islice(itertools.cycle(x), n)
+
+
+def _strs(x):
+    if x._type in (float, int) and x._valid is None:
+        return map(str, x._data)
+    return map(str, x)
+
+
+def _paste_plan(args, sep):
+    # the pieces of each line, length one arguments turned to str once
+    # and merged with their constant neighbours, longer ones as columns
+    vecs = tuple(x if isvector(x) else c(x) for x in args)
+    n = max(map(len, vecs), default=0)
+    pieces = list()
+    for x in vecs:
+        if len(x) > 1 and n > 1:
+            strs = _strs(x)
+            pieces.append(strs if len(x) == n else _recycle(list(strs), n))
+            continue
+        s = str(x[0]) if len(x) else ""
+        if pieces and isinstance(pieces[-1], str):
+            pieces[-1] = pieces[-1] + sep + s
+        else:
+            pieces.append(s)
+    return pieces, n
+
+
+def _write_lines(strs, file):
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "w", encoding="utf-8") as f:
+            return _write_lines(strs, f)
+    file.writelines(map(op.add, strs, itertools.repeat("\n")))
+
+
+def paste(*args, sep=" ", collapse=None, file=None):
+    # file is a path or text file to stream the lines to instead
+    pieces, n = _paste_plan(args, sep)
+    if len(pieces) == 1 and not isinstance(pieces[0], str):
+        strs, = pieces
+    else:
+        cols = (
+            itertools.repeat(x, n) if isinstance(x, str) else x
+            for x in pieces
+        )
+        strs = map(sep.join, zip(*cols))
+    if isinstance(collapse, str):
+        strs = collapse.join(strs)
+        if file is None:
+            return strs
+        strs = (strs,)
+    if file is not None:
+        return _write_lines(strs, file)
+    return vector._new(tuple(strs))
+
+
+def sprintf(fmt, *args, file=None):
+    # C-style formats, fmt and args recycled together, NA rows give NA
+    vecs = tuple(x if isvector(x) else c(x) for x in (fmt, *args))
+    n = max(map(len, vecs)) if all(map(len, vecs)) else 0
+    cols = tuple(_recycle(x, n) for x in vecs)
+    valid = _mask_and(*(_mask(x, n) for x in vecs))
+    if valid is not None:
+        cols = tuple(itertools.compress(x, valid) for x in cols)
+    fmts, *cols = cols
+    strs = map(op.mod, fmts, zip(*cols) if cols else itertools.repeat(()))
+    if file is not None:
+        if valid is not None:
+            strs = map(str, _unsplit(strs, valid, NA))
+        return _write_lines(strs, file)
+    return vector(_unsplit(strs, valid, NA))
+
+
+def _cut(x, pos, n):
+    # x at the rows pos of n, all rows if pos is None, down a lazy tree
+    if islazy(x):
+        args = tuple(_cut(a, pos, n) for a in x._args)
+        return lazy._node(x._f, args, x._g, x._type, x._h)
+    if not isvector(x) or pos is None and len(x) == n:
+        return x
+    if not len(x):
+        raise ValueError("cannot recycle a vector of length 0")
+    ind = array.array("q", range(n)) if pos is None else pos
+    if len(x) != n:
+        ind = array.array("q", (i % len(x) for i in ind))
+    return _gather(x, ind)
+
+
+def _rows(x, pos, n):
+    # a branch on the rows pos only, callables get the positions
+    m = n if pos is None else len(pos)
+    if callable(x) and not islazy(x):
+        x = x(vector(range(n)) if pos is None else vector._new(pos, int))
+    else:
+        x = _cut(x, pos, n)
+    if islazy(x):
+        x = x.force()
+    if not isvector(x):
+        return itertools.repeat(x, m)
+    if len(x) == 1 and m != 1:
+        return itertools.repeat(x[0], m)
+    if len(x) != m:
+        raise ValueError("branch gave {} values for {} rows".format(len(x), m))
+    return x
 
 
-def paste(*args, sep=" ", collapse=None):
-    vecs = tuple(
-        (x if isvector(x) else c(x)).astype(str)
-        for x in args
+def _truth(x):
+    # true, false and NA rows of a condition, as byte masks
+    if isvector(x) and x._type is bool:
+        data, valid = x._data, x._valid
+        if isinstance(data, (array.array, memoryview)):
+            yes = bytes(data)
+        else:
+            yes = bytes(map(bool, data))
+    else:
+        vals = tuple(x)
+        valid = bytes(map(_is_na_singular, vals)).translate(_FLIP)
+        yes = bytes(v is not NA and bool(v) for v in vals)
+    no = yes.translate(_FLIP)
+    if valid is None:
+        return yes, no
+    return _mask_and(yes, valid), _mask_and(no, valid)
+
+
+def _scatter(out, rows, vals):
+    collections.deque(map(out.__setitem__, rows, vals), 0)
+
+
+def _case_len(cases, default):
+    # conditions set the length, then values, callables have none
+    for group in (cases[::2], cases[1::2] + (default,)):
+        lens = tuple(len(x) for x in group if isvector(x) or islazy(x))
+        if lens:
+            return max(lens)
+    return 1
+
+
+def case_when(*cases, default=NA):
+    # condition, value, condition, value, ...: each row takes the value
+    # of its first true condition, or default, NA if a condition is NA
+    # first; conditions and values run only on the rows still open
+    if len(cases) % 2:
+        raise ValueError("case_when takes condition, value pairs")
+    cases = tuple(
+        vector(x) if isnonstriter(x) and not islazy(x) else x for x in cases
     )
-    vec = vector(map(sep.join, zip(*_repeat_many(vecs))))
-    if isinstance(collapse, str):
-        return collapse.join(vec)
-    return vec
+    n = _case_len(cases, default)
+    out = [NA] * n
+    pos = None
+    for cond, value in zip(cases[::2], cases[1::2]):
+        yes, no = _truth(_rows(cond, pos, n))
+        rows = range(n) if pos is None else pos
+        hit = array.array("q", itertools.compress(rows, yes))
+        pos = array.array("q", itertools.compress(rows, no))
+        if hit:
+            _scatter(out, hit, _rows(value, hit, n))
+        if not pos:
+            return vector(out)
+    rows = range(n) if pos is None else pos
+    _scatter(out, rows, _rows(default, pos, n))
+    return vector(out)
 
 
 def ifelse(test, yes, no):
-    return vector(map(_ifelse_singular, test, _repeat(yes), _repeat(no)))
+    if isvector(test) and test._type is bool and test._valid is None:
+        t = _type_of(yes)
+        if t is not None and t == _type_of(no) \
+                and not islazy(yes) and not islazy(no) \
+                and _mask(yes, 1) is None and _mask(no, 1) is None:
+            buf = backend.active.ifelse(
+                test._data, _raw_data(yes), t, _raw_data(no), t, t
+            )
+            if buf is not None:
+                return vector._new(buf, t)
+    return case_when(test, yes, default=no)
+
+
+def _nan_key(v):
+    return NaN if isinstance(v, float) and v != v else v
+
+
+def _keyed(x):
+    # the values of x as hash keys: every nan is the one NaN, which a
+    # dict finds by identity, so nan matches nan as in R
+    if x._type in (bool, int):
+        return x
+    return list(map(_nan_key, x))
+
+
+def _hash_index(table):
+    # first position of each value, built once per (immutable) table
+    if table._index is None:
+        n = len(table)
+        keys = _keyed(table)
+        table._index = dict(zip(reversed(keys), range(n - 1, -1, -1)))
+    return table._index
 
 
 def match(x, table, nomatch=NA):
@@ -356,12 +847,34 @@ def match(x, table, nomatch=NA):
         x = c(x)
     if not isvector(table):
         table = c(table)
-    return vector(x).apply(catch(table.index, ValueError, nomatch))
+    try:
+        index = _hash_index(table)
+        keys = _keyed(x)
+        return vector(map(index.get, keys, itertools.repeat(nomatch)))
+    except TypeError:
+        # unhashable values, fall back to a linear search
+        return x.apply(catch(table.index, ValueError, nomatch))
+
+
+def isin(x, table):
+    if not isvector(x):
+        x = c(x)
+    if not isvector(table):
+        table = c(table)
+    try:
+        return vector(map(_hash_index(table).__contains__, _keyed(x)))
+    except TypeError:
+        return vector(map(table.__contains__, x))
 
 
 def which(x):
     if not isvector(x):
         x = c(x)
+    if x._type is bool:
+        buf = backend.active.which(x._data)
+        if buf is not None:
+            return vector._new(buf, int)
+        return vector(itertools.compress(range(len(x)), x._data))
     return vector(itertools.compress(range(len(x)), x))
 
 
@@ -369,37 +882,460 @@ def unique(itr):
     return vector(dict.fromkeys(itr))
 
 
+def duplicated(x, from_last=False, seen=None):
+    # True where a value appeared earlier (or later, from_last);
+    # seen is a set of values from earlier chunks, updated in place
+    if not isvector(x):
+        x = c(x)
+    n = len(x)
+    keys = _keyed(x)
+    if from_last:
+        first = dict(zip(keys, range(n)))
+    else:
+        first = _hash_index(x)
+    dup = map(op.ne, map(first.__getitem__, keys), range(n))
+    if seen is not None:
+        dup = map(op.or_, dup, map(seen.__contains__, keys))
+        dup = list(dup)
+        seen.update(first)
+    return vector(dup)
+
+
+# FUNCTIONS (GROUPING)
+
+
+def _index_keys(index, n):
+    # several indexes if a list or tuple of sequences as long as x,
+    # else one; a flat list or tuple of labels is one index
+    if isinstance(index, (list, tuple)) and index and all(
+        isnonstriter(v) and len(v) == n for v in index
+    ):
+        return index
+    return (index,)
+
+
+def _group_rows(index, n):
+    # a group number per row, numbered by first appearance, and the keys;
+    # rows with NA in any key belong to no group
+    index = tuple(v if isvector(v) else c(v) for v in index)
+    if any(len(v) != n for v in index):
+        raise ValueError("index lengths differ")
+    keys = _keyed(index[0]) if len(index) == 1 else \
+        zip(*map(_keyed, index))
+    valid = _mask_and(*(v._valid for v in index))
+    rows = range(n)
+    if valid is not None:
+        keys = itertools.compress(keys, valid)
+        rows = list(itertools.compress(rows, valid))
+    ids = dict()
+    # len(ids) is read as each key arrives, so new keys count up
+    codes = list(map(ids.setdefault, keys, map(len, itertools.repeat(ids))))
+    return rows, codes, list(ids)
+
+
+def _na_last(key):
+    if isinstance(key, tuple):
+        return tuple(map(_na_last, key))
+    if is_na(key):
+        return (2, 0)
+    # nan after the numbers, before NA, as in R
+    return (1, 0) if key is NaN else (0, key)
+
+
+def _sorted_keys(keys):
+    # sorted if possible, NA last, else in order of appearance
+    try:
+        return sorted(keys, key=_na_last)
+    except TypeError:
+        return keys
+
+
+def _reduce_sum(codes, vals, k):
+    acc = [0] * k
+    for g, v in zip(codes, vals):
+        acc[g] += v
+    return acc
+
+
+def _reduce_count(codes, vals, k):
+    acc = [0] * k
+    for g in codes:
+        acc[g] += 1
+    return acc
+
+
+def _reduce_mean(codes, vals, k):
+    acc = [0] * k
+    count = [0] * k
+    for g, v in zip(codes, vals):
+        acc[g] += v
+        count[g] += 1
+    return [s / m if m else NA for s, m in zip(acc, count)]
+
+
+def _reduce_extreme(better, empty):
+    def reducef(codes, vals, k):
+        acc = [empty] * k
+        seen = [False] * k
+        for g, v in zip(codes, vals):
+            if not seen[g] or better(v, acc[g]):
+                acc[g] = v
+                seen[g] = True
+        return acc
+    return reducef
+
+
+def _reduce_var(codes, vals, k):
+    # Welford's update, one pass and no groups materialized
+    count = [0] * k
+    avg = [0.0] * k
+    m2 = [0.0] * k
+    for g, v in zip(codes, vals):
+        count[g] += 1
+        d = v - avg[g]
+        avg[g] += d / count[g]
+        m2[g] += d * (v - avg[g])
+    return [s / (m - 1) if m > 1 else NA for s, m in zip(m2, count)]
+
+
+_REDUCERS = {
+    "count": _reduce_count,
+    "max": _reduce_extreme(op.gt, -Inf),
+    "mean": _reduce_mean,
+    "min": _reduce_extreme(op.lt, Inf),
+    "sum": _reduce_sum,
+    "var": _reduce_var,
+}
+
+
+def table(*x, use_na=False, counts=None):
+    # counts per value, or per combination of values across several
+    # vectors (tuple keys); counts is a table from earlier chunks
+    if not x:
+        raise TypeError("table needs at least one vector")
+    x = tuple(v if isvector(v) else c(v) for v in x)
+    n = len(x[0])
+    if any(len(v) != n for v in x):
+        raise ValueError("argument lengths differ")
+    if len(x) == 1 and x[0]._type is not None and x[0]._valid is None:
+        keys = x[0]._data
+        if x[0]._type is bool:
+            keys = map(bool, keys)
+        elif x[0]._type is float:
+            keys = map(_nan_key, keys)
+    else:
+        keys = _keyed(x[0]) if len(x) == 1 else zip(*map(_keyed, x))
+        valid = _mask_and(*(v._valid for v in x))
+        if valid is not None and not use_na:
+            keys = itertools.compress(keys, valid)
+    tab = collections.Counter(counts)
+    tab.update(keys)
+    return {k: tab[k] for k in _sorted_keys(tab)}
+
+
+def tabulate(x, nbins=None, counts=None):
+    # counts of the ints 0, 1, ..., nbins - 1, others and NA ignored;
+    # counts is a tabulation from earlier chunks, of the same nbins
+    if not isvector(x):
+        x = c(x)
+    tab = collections.Counter(x._data if x._valid is None else (
+        itertools.compress(x._data, x._valid)
+    ))
+    if nbins is None:
+        nbins = len(counts) if counts is not None else \
+            max(1, int(max(tab, default=0)) + 1)
+    res = [tab[i] for i in range(nbins)]
+    if counts is not None:
+        res = list(map(op.add, res, counts))
+    return vector._new(array.array("q", res), int)
+
+
+def split(x, index):
+    # x cut into a vector per group, index is a vector or a list of them
+    if not isvector(x):
+        x = c(x)
+    index = _index_keys(index, len(x))
+    rows, codes, keys = _group_rows(index, len(x))
+    groups = [list() for _ in keys]
+    appends = [g.append for g in groups]
+    for g, i in zip(codes, rows):
+        appends[g](i)
+    groups = dict(zip(keys, groups))
+    return {k: x[vector(groups[k])] for k in _sorted_keys(keys)}
+
+
+def tapply(x, index, f, na_rm=False, workers=None, chunksize=None):
+    # f by group, f is a function of a vector, optionally run in processes,
+    # or names a one-pass reducer (count, max, mean, min, sum, var)
+    if not isvector(x):
+        x = c(x)
+    index = _index_keys(index, len(x))
+    if not isinstance(f, str):
+        groups = split(x, index)
+        if workers is None:
+            return {k: f(v) for k, v in groups.items()}
+        vals = parallel.pmap(
+            f, list(groups.values()), workers=workers, chunksize=chunksize
+        )
+        return dict(zip(groups, vals))
+    if f not in _REDUCERS:
+        raise ValueError("unknown reducer: {}".format(f))
+
+    rows, codes, keys = _group_rows(index, len(x))
+    vals = x._data if x._type is not None else tuple(x)
+    if len(rows) != len(x):
+        vals = tuple(map(vals.__getitem__, rows))
+    if x._type is bool:
+        vals = map(bool, vals)
+    bad = set()
+    valid = x._valid
+    if valid is not None and (na_rm or f != "count"):
+        # NA values are skipped, their groups are NA without na_rm
+        ok = bytes(map(valid.__getitem__, rows))
+        if not na_rm:
+            bad = set(itertools.compress(codes, map(op.not_, ok)))
+        codes = list(itertools.compress(codes, ok))
+        vals = itertools.compress(vals, ok)
+    res = _REDUCERS[f](codes, vals, len(keys))
+    res = {
+        key: NA if g in bad else val
+        for g, (key, val) in enumerate(zip(keys, res))
+    }
+    return {k: res[k] for k in _sorted_keys(keys)}
+
+
 # FUNCTIONS (REGEX)
 
 
-def grepl(pattern, x):
-    if not isinstance(pattern, re.Pattern):
-        pattern = re.compile(pattern)
-    return ~is_none(x.apply(pattern.search))
+@functools.lru_cache(maxsize=512)
+def _compile(pattern):
+    return re.compile(pattern)
+
+
+def _pattern(pattern):
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    return _compile(pattern)
+
+
+def _strings(x):
+    # the non-NA elements of x, as str
+    itr = x if x._valid is None else itertools.compress(x, x._valid)
+    strings = tuple(itr)
+    if x._type is not None or not set(map(type, strings)) <= {str}:
+        strings = tuple(map(str, strings))
+    return strings
+
+
+def _unsplit(vals, valid, fill):
+    # put values back around the NA slots they skipped
+    if valid is None:
+        return list(vals)
+    itr = iter(vals)
+    out = list()
+    start = 0
+    for i in _na_positions(valid):
+        out.extend(itertools.islice(itr, i - start))
+        out.append(fill)
+        start = i + 1
+    out.extend(itr)
+    return out
+
+
+def _regex_kernel(kind, pattern, strings, *args):
+    if kind == "grepl":
+        return bytes(map(bool, map(pattern.search, strings)))
+    if kind == "gsub":
+        repl, count = args
+        n = len(strings)
+        return list(map(pattern.sub, itertools.repeat(repl, n), strings,
+                        itertools.repeat(count, n)))
+    if kind == "gextr":
+        return [m.group() if m else NA for m in map(pattern.search, strings)]
+    if kind == "gextrall":
+        return list(map(pattern.findall, strings))
+
+
+def _regex(kind, pattern, x, *args, workers=None, chunksize=None):
+    # one pass over the strings of x, or chunks of them across processes
+    if not isvector(x):
+        x = c(x)
+    pattern = _pattern(pattern)
+    strings = _strings(x)
+    if workers is None:
+        return _regex_kernel(kind, pattern, strings, *args), x._valid
+    chunks = parallel.chunks(strings, workers=workers, chunksize=chunksize)
+    calls = ((kind, pattern, chunk, *args) for chunk, in chunks)
+    parts = parallel.pstarmap(_regex_kernel, calls, workers=workers)
+    return list(itertools.chain.from_iterable(parts)), x._valid
+
+
+def grepl(pattern, x, workers=None, chunksize=None):
+    vals, valid = _regex("grepl", pattern, x, workers=workers,
+                         chunksize=chunksize)
+    buf = array.array("b", bytes(_unsplit(vals, valid, False)))
+    return vector._new(buf, bool)
+
+
+def grep(pattern, x, workers=None, chunksize=None):
+    return which(grepl(pattern, x, workers, chunksize))
+
+
+def gsub(pattern, repl, x, count=None, workers=None, chunksize=None):
+    vals, valid = _regex("gsub", pattern, x, repl, count or 0,
+                         workers=workers, chunksize=chunksize)
+    return vector(_unsplit(vals, valid, NA))
+
+
+def gextr(pattern, x, workers=None, chunksize=None):
+    vals, valid = _regex("gextr", pattern, x, workers=workers,
+                         chunksize=chunksize)
+    return vector(_unsplit(vals, valid, NA))
+
+
+def gextrall(pattern, x, workers=None, chunksize=None):
+    vals, valid = _regex("gextrall", pattern, x, workers=workers,
+                         chunksize=chunksize)
+    return vector(_unsplit(map(c, vals), valid, NA))
+
+
+# FUNCTIONS (VECTOR STORAGE)
 
 
-def grep(pattern, x):
-    return which(grepl(pattern, x))
+def _na_positions(valid):
+    i = valid.find(0)
+    while i != -1:
+        yield i
+        i = valid.find(0, i + 1)
 
 
-def gsub(pattern, repl, x, count=None):
-    if not isinstance(pattern, re.Pattern):
-        pattern = re.compile(pattern)
-    if count:
-        return x.apply(lambda s: pattern.sub(repl, s, count))
-    return x.apply(lambda s: pattern.sub(repl, s))
+def _fill(data, t, valid):
+    if valid is not None:
+        for i in _na_positions(valid):
+            data[i] = _PLACEHOLDER[t]
+    return data
 
 
-def gextr(pattern, x):
-    if not isinstance(pattern, re.Pattern):
-        pattern = re.compile(pattern)
-    return x.pipe(pattern.search, na_safe(re.Match.group))
+def _store(itr):
+    if type(itr) is range:
+        return _Seq(0, 1, itr), int, None
+    data = itr if type(itr) is tuple else tuple(itr)
+    types = set(map(type, data))
+    valid = None
+    if _NA in types:
+        types.discard(_NA)
+        isna = bytes(map(isinstance, data, itertools.repeat(_NA)))
+        valid = isna.translate(_FLIP)
+    if len(types) == 1:
+        t = types.pop()
+        if t in _TYPECODES:
+            try:
+                buf = _fill(list(data), t, valid)
+                return array.array(_TYPECODES[t], buf), t, valid
+            except OverflowError:
+                pass
+    return data, None, valid
 
 
-def gextrall(pattern, x):
-    if not isinstance(pattern, re.Pattern):
-        pattern = re.compile(pattern)
-    return x.pipe(pattern.findall, c)
+def _native(t, buf, valid=None):
+    return vector._new(_fill(buf, t, valid), t, valid)
+
+
+def _raw_data(x):
+    return x._data if isvector(x) else x
+
+
+def _typed(t, itr, valid=None):
+    # None if the values do not fit the buffer, caller falls back
+    if t is None:
+        return None
+    try:
+        buf = array.array(_TYPECODES[t], itr)
+    except (ArithmeticError, TypeError, ValueError):
+        return None
+    return _native(t, buf, valid)
+
+
+def _unmask(vec):
+    lst = list(map(bool, vec._data) if vec._type is bool else vec._data)
+    for i in _na_positions(vec._valid):
+        lst[i] = NA
+    return lst
+
+
+def _mask(x, n):
+    # validity of x, recycled to length n
+    if islazy(x):
+        masks = tuple(_mask(a, len(x)) for a in x._args)
+        valid = _mask_and(*masks)
+    elif isvector(x):
+        valid = x._valid
+    else:
+        return None
+    if valid is None or len(valid) == n:
+        return valid
+    return (valid * (n // len(valid) + 1))[:n]
+
+
+def _mask_and(*masks):
+    masks = tuple(m for m in masks if m is not None)
+    if not masks:
+        return None
+    n = len(masks[0])
+    bits = functools.reduce(
+        op.and_, (int.from_bytes(m, "little") for m in masks)
+    )
+    return bits.to_bytes(n, "little")
+
+
+def _type_of(x):
+    if isvector(x) or islazy(x):
+        return x._type
+    t = type(x)
+    return t if t in _TYPECODES else None
+
+
+def _compress(x, sel):
+    # selection by a logical vector, NA in sel is never selected
+    valid = x._valid
+    if valid is not None:
+        valid = bytes(itertools.compress(valid, sel._data))
+    if isinstance(x._data, _Take):
+        # narrow the pending gather, still no values copied
+        take = x._data
+        ind = array.array("q", itertools.compress(take.ind, sel._data))
+        return vector._new(_Take(take.data, ind), x._type, valid)
+    data = itertools.compress(x._data, sel._data)
+    if x._type is None:
+        return vector(data)
+    buf = array.array(_TYPECODES[x._type], data)
+    return vector._new(buf, x._type, valid)
+
+
+def _gather(x, ind):
+    # selection by positions, as a _Take over the same data
+    n = len(x)
+    if len(ind) and not (-n <= min(ind) and max(ind) < n):
+        raise IndexError("vector index out of range")
+    valid = x._valid
+    if valid is not None:
+        valid = bytes(map(valid.__getitem__, ind))
+    data = x._data
+    if isinstance(data, _Take):
+        # a gather of a gather is one gather
+        ind = array.array("q", map(data.ind.__getitem__, ind))
+        data = data.data
+    elif isinstance(ind, tuple):
+        ind = array.array("q", ind)
+    return vector._new(_Take(data, ind), x._type, valid)
+
+
+def _raw(x, n):
+    if not isvector(x):
+        return itertools.repeat(x)
+    if len(x) >= n:
+        return x._data
+    return itertools.chain.from_iterable(itertools.repeat(x._data))
 
 
 # FUNCTIONS (VECTOR LOADING)
@@ -412,49 +1348,357 @@ def _nanot(x):
 
 
 def _operate(f, flip=False, singular=False):
-    f = na_safe(f)
+    g = na_safe(f)
     if singular:
         def operatef(self):
-            return vector(map(f, self))
-    elif flip:
-        def operatef(self, other):
-            return vector(map(f, _repeat(other), self))
+            if self._type is not None:
+                t = _result_type(f, self._type)
+                key = (f.__name__,)
+                buf = backend.active.unary(key, self._data, self._type, t)
+                if buf is not None:
+                    return _native(t, buf, self._valid)
+                vec = _typed(t, map(f, self._data), self._valid)
+                if vec is not None:
+                    return vec
+            return vector(map(g, self))
     else:
         def operatef(self, other):
-            return vector(map(f, self, _repeat(other)))
+            if islazy(other):
+                return NotImplemented
+            t = _type_of(other)
+            if self._type is not None and t is not None:
+                n = len(self)
+                valid = _mask_and(self._valid, _mask(other, n))
+                tr = _result_type(f, self._type, t)
+                if tr is not None:
+                    buf = backend.active.binary(
+                        f.__name__, self._data, self._type,
+                        _raw_data(other), t, tr, flip
+                    )
+                    if buf is not None:
+                        return _native(tr, buf, valid)
+                args = (self._data, _raw(other, n))
+                vals = map(f, *(args[::-1] if flip else args))
+                vec = _typed(tr, vals, valid)
+                if vec is not None:
+                    return vec
+            if flip:
+                return vector(map(g, _repeat(other), self))
+            return vector(map(g, self, _repeat(other)))
     return operatef
 
 
+def _defer(f, flip=False, singular=False):
+    g = _nanot if f is op.not_ else na_safe(f)
+    h = op.invert if f is op.not_ else f
+    if singular:
+        def deferf(self):
+            return lazy._node(f, (self,), g, h=h)
+    elif flip:
+        def deferf(self, other):
+            return lazy._node(f, (other, self), g, h=h)
+    else:
+        def deferf(self, other):
+            return lazy._node(f, (self, other), g, h=h)
+    return deferf
+
+
+def _lazy_native(x):
+    return backend.active.native and len(x) >= backend.active.threshold
+
+
+def _lazy_eager(x):
+    # native backends run each node as a whole-vector operation instead
+    if not islazy(x):
+        return x
+    if x._f is None:
+        return x._args[0]
+    return x._h(*map(_lazy_eager, x._args))
+
+
+def _lazy_iter(x, generic):
+    # raw values while the whole tree is typed, boxed and NA safe if not
+    generic = generic or x._type is None
+    if x._f is None:
+        vec, = x._args
+        return iter(vec) if generic else iter(vec._data)
+    args = (_lazy_arg(a, len(x), generic) for a in x._args)
+    return map(x._g if generic else x._f, *args)
+
+
+def _lazy_arg(x, n, generic):
+    if islazy(x):
+        if len(x) >= n:
+            return _lazy_iter(x, generic)
+        x = x.force()
+    if not isvector(x):
+        return itertools.repeat(x)
+    data = x if generic else x._data
+    if len(x) >= n:
+        return iter(data)
+    return itertools.chain.from_iterable(itertools.repeat(data))
+
+
+# COMPACT STORAGE CLASSES
+
+
+class _Seq:
+    # start + step * i for each i in rng, like R's compact sequences
+    __slots__ = ("rng", "start", "step")
+
+    def __init__(self, start, step, rng):
+        self.start = start
+        self.step = step
+        self.rng = rng
+
+    def __reduce__(self):
+        return _Seq, (self.start, self.step, self.rng)
+
+    def __len__(self):
+        return len(self.rng)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return _Seq(self.start, self.step, self.rng[i])
+        return self.start + self.step * self.rng[i]
+
+    def __iter__(self):
+        n = len(self.rng)
+        prod = map(op.mul, itertools.repeat(self.step, n), self.rng)
+        return map(op.add, itertools.repeat(self.start, n), prod)
+
+    def index(self, x, *args):
+        return op.indexOf(self, x) if not args else list(self).index(x, *args)
+
+    def count(self, x):
+        return op.countOf(self, x)
+
+    def min(self):
+        return min(self[0], self[-1])
+
+    def max(self):
+        return max(self[0], self[-1])
+
+    def sum(self):
+        rng = self.rng
+        if not rng:
+            return 0
+        total = (rng[0] + rng[-1]) * len(rng) // 2
+        return self.start * len(rng) + self.step * total
+
+
+class _Rep:
+    # data[(i // each) % len(data)] for each i in rng, like R's rep
+    __slots__ = ("data", "each", "rng")
+
+    def __init__(self, data, each, rng):
+        self.data = data
+        self.each = each
+        self.rng = rng
+
+    def __reduce__(self):
+        return _Rep, (self.data, self.each, self.rng)
+
+    def __len__(self):
+        return len(self.rng)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return _Rep(self.data, self.each, self.rng[i])
+        return self.data[(self.rng[i] // self.each) % len(self.data)]
+
+    def __iter__(self):
+        n = len(self.rng)
+        ind = map(op.floordiv, self.rng, itertools.repeat(self.each, n))
+        ind = map(op.mod, ind, itertools.repeat(len(self.data), n))
+        return map(self.data.__getitem__, ind)
+
+    def index(self, x, *args):
+        return op.indexOf(self, x) if not args else list(self).index(x, *args)
+
+    def count(self, x):
+        return op.countOf(self, x)
+
+    def _counts(self):
+        # times each element of data is repeated, None if sliced
+        n = len(self.rng)
+        if self.rng != range(n):
+            return None
+        full, rem = divmod(n, len(self.data) * self.each)
+        return tuple(
+            full * self.each + min(self.each, max(0, rem - j * self.each))
+            for j in range(len(self.data))
+        )
+
+    def min(self):
+        counts = self._counts()
+        if counts is None:
+            return min(self)
+        return min(itertools.compress(self.data, counts))
+
+    def max(self):
+        counts = self._counts()
+        if counts is None:
+            return max(self)
+        return max(itertools.compress(self.data, counts))
+
+    def sum(self):
+        counts = self._counts()
+        if counts is None:
+            return sum(self)
+        return sum(map(op.mul, self.data, counts))
+
+
+class _Take:
+    # data[j] for each j in ind, a gather that shares data and is composed
+    # with later gathers instead of being carried out
+    __slots__ = ("data", "ind")
+
+    def __init__(self, data, ind):
+        self.data = data
+        self.ind = ind
+
+    def __len__(self):
+        return len(self.ind)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return _Take(self.data, self.ind[i])
+        return self.data[self.ind[i]]
+
+    def __iter__(self):
+        return map(self.data.__getitem__, self.ind)
+
+    def index(self, x, *args):
+        return op.indexOf(self, x) if not args else list(self).index(x, *args)
+
+    def count(self, x):
+        return op.countOf(self, x)
+
+
+def _unview(data, t):
+    # views as their values, not the buffer behind them, for pickling
+    if not isinstance(data, (memoryview, _Take)):
+        return data
+    if t is None:
+        return tuple(data)
+    if isinstance(data, memoryview):
+        return array.array(_TYPECODES[t], data.tobytes())
+    return array.array(_TYPECODES[t], data)
+
+
 # VECTOR CLASS
 
 
-class vector(tuple):
+class vector:
+    # numbers live unboxed in an array.array, anything else in a tuple
+    # _valid is a byte per element (0 where NA), None if there are no NA
+    __slots__ = ("_data", "_index", "_type", "_valid")
+
+    def __init__(self, itr=()):
+        if isvector(itr):
+            self._data, self._type = itr._data, itr._type
+            self._valid = itr._valid
+        else:
+            self._data, self._type, self._valid = _store(itr)
+        self._index = None
+
+    @classmethod
+    def _new(cls, data, t=None, valid=None):
+        self = cls.__new__(cls)
+        self._data = data
+        self._index = None
+        self._type = t
+        self._valid = valid if valid and 0 in valid else None
+        return self
+
     def __repr__(self):
-        return "c" + super().__repr__()
+        return "c" + repr(tuple(self))
+
+    def __reduce__(self):
+        data, t = self._data, self._type
+        if isinstance(data, _Rep):
+            # still repeated, over the values it repeats
+            data = _Rep(_unview(data.data, t), data.each, data.rng)
+        else:
+            data = _unview(data, t)
+        return vector._new, (data, t, self._valid)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        if self._valid is not None and self._type is not None:
+            return iter(_unmask(self))
+        if self._type is bool:
+            return map(bool, self._data)
+        return iter(self._data)
+
+    def __reversed__(self):
+        return iter(self[::-1])
+
+    def __contains__(self, x):
+        if self._valid is not None and self._type is not None:
+            return x in iter(self)
+        return x in self._data
 
     def __neg__(self):
         # get pylint to shut up
         return vector(map(op.neg, self))
 
     def __invert__(self):
+        if self._type is not None:
+            buf = backend.active.unary(("not_",), self._data, self._type, bool)
+            if buf is not None:
+                return _native(bool, buf, self._valid)
+            return _typed(bool, map(op.not_, self._data), self._valid)
         return vector(map(_nanot, self))
 
     def __getitem__(self, i):
         if _is_na_singular(i):
             return NA
         if isinstance(i, slice):
-            return vector(super().__getitem__(i))
+            # a view, arrays share their buffer, nothing is copied
+            data = self._data
+            if isinstance(data, (array.array, memoryview)):
+                data = memoryview(data)
+            valid = None if self._valid is None else self._valid[i]
+            return vector._new(data[i], self._type, valid)
 
         try:
-            return super().__getitem__(i)
+            x = self._data[i]
         except TypeError as err:
+            if isvector(i) and i._type is bool:
+                return _compress(self, i)
+            if isvector(i) and i._type is int and i._valid is None:
+                return _gather(self, i._data)
             if isiter(i):
                 i = tuple(i)
-                t = type(next(iter(i)))
+                t = type(next(iter(i), None))
                 if t is bool:
-                    return vector(itertools.compress(self, i))
-                return vector(map(self.__getitem__, i))
+                    return _compress(self, vector(i))
+                try:
+                    return _gather(self, i)
+                except (OverflowError, TypeError):
+                    # NA or odd positions, one at a time
+                    return vector(map(self.__getitem__, i))
             raise err
+        if self._valid is not None and not self._valid[i]:
+            return NA
+        return bool(x) if self._type is bool else x
+
+    def index(self, x, *args):
+        if self._valid is not None and self._type is not None or args:
+            return tuple(self).index(x, *args)
+        return op.indexOf(self._data, x)
+
+    def count(self, x):
+        if self._valid is not None and self._type is not None:
+            return tuple(self).count(x)
+        return op.countOf(self._data, x)
 
     def round(self, ndigits=None):
         f = na_safe(round)
@@ -471,7 +1715,7 @@ class vector(tuple):
         return vector(itertools.accumulate(self, f))
 
     def sort(self, key=None, reverse=False):
-        return vector(sorted(self, key=key, reverse=reverse))
+        return sort(self, key=key, reverse=reverse)
 
     def filter(self, f, invert=False):
         if invert:
@@ -493,25 +1737,34 @@ class vector(tuple):
         return vector(map(na_safe(f), self, *args))
 
     def thread(self, f, *args, **kwargs):
-        with concurrent.futures.ThreadPoolExecutor() as exe:
-            return vector(exe.map(na_safe(part(f, *args, **kwargs)), self))
+        f = na_safe(part(f, *args, **kwargs))
+        return vector(parallel.pmap(f, self, kind="thread"))
 
     def thread_map(self, f, *args):
-        with concurrent.futures.ThreadPoolExecutor() as exe:
-            return vector(exe.map(na_safe(f), self, *args))
+        return vector(parallel.pmap(na_safe(f), self, *args, kind="thread"))
 
     def proc_map(self, f, *args):
         if f.__name__ == "<lambda>":
             raise Exception("can't use a lambda here")
         # never NA safe!
-        with concurrent.futures.ProcessPoolExecutor() as exe:
-            return vector(exe.map(f, self, *args))
-
-    def tapply(self, index, f):
-        rng = seq(0, len(self))
-        ind = order(index)
-        grp = itertools.groupby(rng[ind], index.__getitem__)
-        return {k: f(self[v]) for k, v in grp}
+        vecs = (self, *args)
+        if all(isvector(x) and x._type in (float, int) and x._valid is None
+               for x in vecs):
+            # numbers go through shared memory instead of pickles
+            bufs = (
+                x._data if isinstance(x._data, array.array)
+                else array.array(_TYPECODES[x._type], x._data)
+                for x in vecs
+            )
+            res = parallel.pmap_shared(f, *bufs)
+            if isinstance(res, array.array):
+                return vector._new(res, _TYPES[res.typecode])
+        else:
+            res = parallel.pmap(f, self, *args)
+        return vector(res)
+
+    def tapply(self, index, f, **kwargs):
+        return tapply(self, index, f, **kwargs)
 
     def pipe(self, *fs):
         x = self
@@ -519,6 +1772,57 @@ class vector(tuple):
             x = vector(map(f, x))
         return x
 
+    def lazy(self):
+        return lazy._node(None, (self,))
+
+
+# LAZY CLASS
+
+
+class lazy:
+    # operator chains build a tree, evaluated in one pass by force
+    __slots__ = ("_args", "_f", "_g", "_h", "_len", "_type")
+
+    @classmethod
+    def _node(cls, f, args, g=None, t=None, h=None):
+        # f runs on raw values, g on boxed values, h on whole vectors
+        self = cls.__new__(cls)
+        self._args = args
+        self._f = f
+        self._g = g
+        self._h = h
+        self._len = next(len(x) for x in args if isvector(x) or islazy(x))
+        if f is None or t is not None:
+            self._type = args[0]._type if f is None else t
+        else:
+            types = tuple(map(_type_of, args))
+            self._type = None if None in types else _result_type(f, *types)
+        return self
+
+    def __repr__(self):
+        return "lazy({})".format(repr(self.force()))
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        if self._type is not None and _mask(self, len(self)) is not None:
+            return iter(self.force())
+        itr = _lazy_iter(self, False)
+        return map(bool, itr) if self._type is bool else itr
+
+    def lazy(self):
+        return self
+
+    def force(self):
+        if _lazy_native(self):
+            return _lazy_eager(self)
+        valid = _mask(self, len(self))
+        vec = _typed(self._type, _lazy_iter(self, False), valid)
+        if vec is None:
+            return vector(_lazy_iter(self, True))
+        return vec
+
 
 # CLASS LOADING (VECTOR, MUST RUN)
 
@@ -549,9 +1853,14 @@ multiple = (
 for f in singular:
     lname = "__{}__".format(f.__name__)
     setattr(vector, lname, _operate(f, singular=True))
+    setattr(lazy, lname, _defer(f, singular=True))
 
 for f in multiple:
     lname = "__{}__".format(f.__name__)
     rname = "__r{}__".format(f.__name__)
     setattr(vector, lname, _operate(f))
     setattr(vector, rname, _operate(f, flip=True))
+    setattr(lazy, lname, _defer(f))
+    setattr(lazy, rname, _defer(f, flip=True))
+
+setattr(lazy, "__invert__", _defer(op.not_, singular=True))
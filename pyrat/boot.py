@@ -0,0 +1,184 @@
+__author__ = "Shane Drabing"
+__license__ = "MIT"
+__email__ = "shane.drabing@gmail.com"
+
+
+# MODULE EXPOSURE
+
+
+__all__ = [
+    "boot",
+    "boot_ci",
+    "permutation_test",
+]
+
+
+# IMPORTS
+
+
+import array
+import random
+import statistics
+
+from pyrat import parallel
+from pyrat.base import NA, c, is_na, isvector, mean, vector
+from pyrat.stats import quantile, sd
+
+
+# CONSTANTS
+
+
+_ALTERNATIVES = ("greater", "less", "two.sided")
+_INTERVALS = ("basic", "norm", "perc")
+
+
+# FUNCTIONS (RESAMPLING)
+
+
+def _rng(seed, r):
+    # a generator per replicate, so replicate r is the same whichever
+    # worker draws it, and however many there are
+    return random.Random("{}:{}".format(seed, r))
+
+
+def _draws(rng, n):
+    # n rows drawn with replacement, from one run of random bytes; the
+    # bias of taking 64 bits modulo n is below n / 2 ** 64
+    bits = array.array("Q", rng.randbytes(8 * n))
+    return array.array("q", [v % n for v in bits])
+
+
+def _rows(x):
+    # the number of rows of a vector, a list of vectors, or a dict frame
+    cols = x.values() if isinstance(x, dict) else \
+        x if isinstance(x, (list, tuple)) else (x,)
+    lens = set(map(len, cols))
+    if len(lens) != 1:
+        raise ValueError("vector lengths unequal")
+    return lens.pop()
+
+
+def _columns(x):
+    if isinstance(x, dict):
+        return {k: v if isvector(v) else c(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return type(x)(v if isvector(v) else c(v) for v in x)
+    return x if isvector(x) else c(x)
+
+
+def _take(x, ind):
+    # x at the rows ind, a gather over the same data, nothing copied
+    ind = vector._new(ind, int)
+    if isinstance(x, dict):
+        return {k: v[ind] for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return type(x)(v[ind] for v in x)
+    return x[ind]
+
+
+def _boot_chunk(x, f, seed, rs):
+    n = _rows(x)
+    out = list()
+    for r in rs:
+        out.append(f(_take(x, _draws(_rng(seed, r), n))))
+    return out
+
+
+def _perm_chunk(x, y, f, paired, seed, rs):
+    # y shuffled against x, or the pooled rows dealt out again
+    m = len(x)
+    pool = y if paired else c(x, y)
+    out = list()
+    for r in rs:
+        rows = array.array("q", range(len(pool)))
+        _rng(seed, r).shuffle(rows)
+        if paired:
+            out.append(f(x, _take(pool, rows)))
+        else:
+            out.append(f(_take(pool, rows[:m]), _take(pool, rows[m:])))
+    return out
+
+
+def _replicate(chunk, args, R, workers, chunksize):
+    # the replicates, run here or a chunk per task in the process pool
+    if workers is None:
+        return vector(chunk(*args, range(R)))
+    parts = parallel.chunks(range(R), workers=workers, chunksize=chunksize)
+    calls = ((*args, rs) for rs, in parts)
+    res = parallel.pstarmap(chunk, calls, "process", workers)
+    return vector(v for part in res for v in part)
+
+
+def _seed(seed):
+    return random.randrange(2 ** 63) if seed is None else seed
+
+
+def boot(x, f, R=1000, seed=None, workers=None, chunksize=None):
+    # f of R resamples of the rows of x (a vector, a list of vectors or a
+    # dict frame), drawn with replacement; f sees views of x, and in the
+    # process pool must be picklable, so no lambdas there
+    x = _columns(x)
+    t0 = f(x)
+    t = _replicate(
+        _boot_chunk, (x, f, _seed(seed)), R, workers, chunksize
+    )
+    ok = t[~is_na(t)]
+    se = sd(ok) if len(ok) > 1 else NA
+    bias = mean(ok) - t0 if len(ok) else NA
+    return {"t0": t0, "t": t, "R": R, "se": se, "bias": bias}
+
+
+def _mean_diff(x, y):
+    return mean(x) - mean(y)
+
+
+def permutation_test(x, y, f=None, R=999, alternative="two.sided",
+                     paired=False, seed=None, workers=None, chunksize=None):
+    # f(x, y) against its values with the rows of x and y pooled and
+    # dealt out again, or with y shuffled against x when paired (for an
+    # association like cor); f is the difference in means by default
+    if alternative not in _ALTERNATIVES:
+        raise ValueError("alternative is greater, less or two.sided")
+    x, y = _columns(x), _columns(y)
+    if paired and len(x) != len(y):
+        raise ValueError("vector lengths unequal")
+    if f is None:
+        f = _mean_diff
+    t0 = f(x, y)
+    t = _replicate(
+        _perm_chunk, (x, y, f, paired, _seed(seed)), R, workers, chunksize
+    )
+    ok = t[~is_na(t)]
+    if is_na(t0) or not len(ok):
+        p = NA
+    else:
+        if alternative == "greater":
+            hits = sum(v >= t0 for v in ok)
+        elif alternative == "less":
+            hits = sum(v <= t0 for v in ok)
+        else:
+            hits = sum(abs(v) >= abs(t0) for v in ok)
+        p = (1 + hits) / (1 + len(ok))
+    return {"t0": t0, "t": t, "R": R, "p_value": p,
+            "alternative": alternative}
+
+
+# FUNCTIONS (INTERVALS)
+
+
+def boot_ci(b, conf=0.95, type="perc"):
+    # an interval from boot(): percentile, basic or normal, as in R's
+    # boot.ci, the percentiles by quantile type 7
+    if type not in _INTERVALS:
+        raise ValueError("type is basic, norm or perc")
+    alpha = (1 - conf) / 2
+    t0, t = b["t0"], b["t"]
+    t = t[~is_na(t)]
+    if type == "norm":
+        z = statistics.NormalDist().inv_cdf(1 - alpha)
+        mid = t0 - b["bias"]
+        return (mid - z * b["se"], mid + z * b["se"])
+    lo, hi = quantile(t, (alpha, 1 - alpha))
+    if type == "basic":
+        return (2 * t0 - hi, 2 * t0 - lo)
+    return (lo, hi)
@@ -0,0 +1,270 @@
+__author__ = "Shane Drabing"
+__license__ = "MIT"
+__email__ = "shane.drabing@gmail.com"
+
+
+# MODULE EXPOSURE
+
+
+__all__ = [
+    "chunks",
+    "configure",
+    "last_stats",
+    "pmap",
+    "pmap_shared",
+    "pstarmap",
+    "settings",
+    "shutdown",
+]
+
+
+# IMPORTS
+
+
+import array
+import atexit
+import concurrent.futures
+import itertools
+import os
+import sys
+import time
+
+from multiprocessing import resource_tracker, shared_memory
+
+
+# CONSTANTS
+
+
+_EXECUTORS = {
+    "process": concurrent.futures.ProcessPoolExecutor,
+    "thread": concurrent.futures.ThreadPoolExecutor,
+}
+
+_TYPECODES = {bool: "b", float: "d", int: "q"}
+
+# chunks per worker when no chunk size is given, to even out the load
+_CHUNKS_PER_WORKER = 4
+
+
+# GLOBALS
+
+
+_pools = dict()
+_settings = {"chunksize": None, "workers": None}
+_stats = dict()
+
+
+# FUNCTIONS (CONFIGURATION)
+
+
+def _workers(kind, workers):
+    if workers is None:
+        workers = _settings["workers"]
+    if workers is None:
+        # the defaults of concurrent.futures
+        cpus = os.cpu_count() or 1
+        workers = cpus if kind == "process" else min(32, cpus + 4)
+    return workers
+
+
+def _pool(kind, workers):
+    # one live pool per kind and size, reused across calls
+    if kind not in _EXECUTORS:
+        raise ValueError("unknown pool kind: {}".format(kind))
+    key = (kind, workers)
+    if getattr(_pools.get(key), "_broken", False):
+        _discard(key)
+    if key not in _pools:
+        if kind == "process":
+            # started before the workers, so that they share it
+            resource_tracker.ensure_running()
+        _pools[key] = _EXECUTORS[kind](workers)
+    return _pools[key]
+
+
+def _discard(key):
+    # a pool with a dead worker takes no more work, the next call
+    # starts a new one
+    exe = _pools.pop(key, None)
+    if exe is not None:
+        exe.shutdown(wait=False)
+
+
+def configure(workers=None, chunksize=None):
+    # new defaults, pools of other sizes are left to shutdown()
+    if workers is not None:
+        _settings["workers"] = workers
+    if chunksize is not None:
+        _settings["chunksize"] = chunksize
+    return settings()
+
+
+def settings():
+    return dict(_settings)
+
+
+def shutdown():
+    while _pools:
+        _, exe = _pools.popitem()
+        exe.shutdown()
+
+
+def last_stats():
+    # wall time of the last call, the time spent inside f summed over
+    # the chunks, and what the pool cost on top of an even split of it
+    return dict(_stats)
+
+
+# FUNCTIONS (MAPPING)
+
+
+def _timed(f, *args):
+    start = time.perf_counter()
+    res = f(*args)
+    return res, time.perf_counter() - start
+
+
+def _map_chunk(f, *cols):
+    return list(map(f, *cols))
+
+
+def pstarmap(f, calls, kind="process", workers=None):
+    # f(*call) for each call, one task each, results in order
+    workers = _workers(kind, workers)
+    calls = tuple(calls)
+    start = time.perf_counter()
+    exe = _pool(kind, workers)
+    try:
+        futures = [exe.submit(_timed, f, *call) for call in calls]
+        res, secs = zip(*(x.result() for x in futures)) if futures \
+            else ((), ())
+    except concurrent.futures.BrokenExecutor:
+        _discard((kind, workers))
+        raise
+    wall = time.perf_counter() - start
+
+    compute = sum(secs)
+    _stats.clear()
+    _stats.update(
+        kind=kind, workers=workers, tasks=len(calls), wall=wall,
+        compute=compute,
+        overhead=max(0.0, wall - compute / max(1, min(workers, len(calls)))),
+    )
+    return list(res)
+
+
+def chunks(*x, kind="process", workers=None, chunksize=None):
+    # slices of equal length sequences, as tuples with one per sequence
+    n = min(map(len, x))
+    workers = _workers(kind, workers)
+    if chunksize is None:
+        chunksize = _settings["chunksize"]
+    if chunksize is None:
+        chunksize = max(1, -(-n // (_CHUNKS_PER_WORKER * workers)))
+    return [
+        tuple(v[i:i + chunksize] for v in x)
+        for i in range(0, n, chunksize)
+    ]
+
+
+def pmap(f, *itrs, kind="process", workers=None, chunksize=None):
+    # map(f, *itrs) in chunks, one task per chunk
+    cols = tuple(x if hasattr(x, "__getitem__") else tuple(x) for x in itrs)
+    parts = chunks(*cols, kind=kind, workers=workers, chunksize=chunksize)
+    calls = ((f, *part) for part in parts)
+    res = pstarmap(_map_chunk, calls, kind, workers)
+    _stats.update(elements=min(map(len, cols)))
+    return list(itertools.chain.from_iterable(res))
+
+
+# FUNCTIONS (SHARED MEMORY)
+
+
+def _attach(name):
+    # the workers share the creator's resource tracker (see _pool), where
+    # the segment is registered once and unregistered by the creator as
+    # it unlinks; before 3.13 attaching registers it again, a no-op
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    return shared_memory.SharedMemory(name)
+
+
+def _shared_chunk(f, ins, out, start, stop):
+    # in a worker, f over views of the inputs, written into a view of out
+    # typed by the first result; the typecode written, or the results
+    # themselves if f gave a type that does not fit
+    names = (*ins, (out, "B"))
+    shms = [_attach(name) for name, _ in names]
+    views = [shm.buf.cast(code) for shm, (_, code) in zip(shms, names)]
+    try:
+        vals = list(map(f, *(v[start:stop] for v in views[:-1])))
+        code = _TYPECODES.get(type(vals[0]))
+        if code is None:
+            return None, vals
+        try:
+            buf = array.array(code, vals)
+        except (OverflowError, TypeError):
+            # f gave other types than the first element did
+            return None, vals
+        views.append(views[-1].cast(code))
+        views[-1][start:stop] = buf
+        return code, None
+    finally:
+        for v in reversed(views):
+            v.release()
+        for shm in shms:
+            shm.close()
+
+
+def pmap_shared(f, *bufs, workers=None, chunksize=None):
+    # map(f, *bufs) for typed array.array inputs, through shared memory:
+    # inputs are copied in once, workers read and write slices in place;
+    # f only runs in the workers, once per element, the type of the
+    # results is the type of f on the first elements, a list if they are
+    # not all of it
+    n = min(map(len, bufs))
+    if n == 0:
+        return list()
+    segments = list()
+    try:
+        ins = list()
+        for x in bufs:
+            size = len(x) * x.itemsize
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            segments.append(shm)
+            shm.buf[:size] = memoryview(x).cast("B")
+            ins.append((shm.name, x.typecode))
+        # room for the widest of the typecodes
+        width = max(array.array(code).itemsize for code in
+                    _TYPECODES.values())
+        shm = shared_memory.SharedMemory(create=True, size=n * width)
+        segments.append(shm)
+
+        parts = chunks(range(n), workers=workers, chunksize=chunksize)
+        calls = (
+            (f, ins, shm.name, rng.start, rng.stop)
+            for rng, in parts
+        )
+        res = pstarmap(_shared_chunk, calls, "process", workers)
+        _stats.update(elements=n)
+        codes = set(code for code, _ in res)
+        if len(codes) == 1 and None not in codes:
+            out = array.array(codes.pop())
+            out.frombytes(shm.buf[:n * out.itemsize])
+            return out
+        # types differ between or within chunks, gathered by value
+        out = list()
+        for (rng,), (code, vals) in zip(parts, res):
+            if code is not None:
+                with shm.buf.cast(code) as view:
+                    vals = view[rng.start:rng.stop].tolist()
+            out.extend(vals)
+        return out
+    finally:
+        # also when a worker fails
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+
+atexit.register(shutdown)
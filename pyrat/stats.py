@@ -1,12 +1,22 @@
 __all__ = [
+    "IQR",
+    "accumulate",
+    "comoments",
     "cor",
     "cov",
     "dev",
+    "fivenum",
+    "lm",
     "mad",
     "median",
+    "moments",
     "na_omit",
+    "predict",
+    "quantile",
     "sd",
+    "sketch",
     "ss",
+    "summary",
     "var",
 ]
 
@@ -14,8 +24,50 @@ __all__ = [
 # IMPORTS
 
 
-from pyrat.base import NA, any_na, c, is_na, isvector, mean, sqrt
-from pyrat.closure import inv
+import array
+import bisect
+import functools
+import itertools
+import math
+import operator as op
+import random
+import sys
+
+from pyrat import backend, parallel
+from pyrat.base import (
+    NA, Inf, _index_keys, any_na, c, force, is_na, isnonstriter, isvector,
+    mean, rmax, rmin, rsum, sqrt, vector,
+)
+
+
+# CONSTANTS
+
+
+# values per block of the moment kernels, small enough to stay in cache
+_BLOCK = 1024
+
+# rows per chunk in predict, and how small a pivot may get, relative
+# to the sum of squares of its column, before lm calls it collinear
+_CHUNK = 65536
+_SINGULAR = 1e-10
+
+# selection sorts everything below this size, or past this many
+# separate groups of ranks
+_SMALL = 4096
+_SPANS = 16
+
+# R's a and b of quantile types 4 to 9, and its tolerance
+_QUANTILE_TYPES = {
+    4: (0, 1), 5: (0.5, 0.5), 6: (0, 0),
+    7: (1, 1), 8: (1 / 3, 1 / 3), 9: (3 / 8, 3 / 8),
+}
+_FUZZ = 4 * sys.float_info.epsilon
+
+# how fast the capacity of the sketch's levels shrinks going down
+_DECAY = 2 / 3
+
+# R's ways of handling NA in cov and cor of a frame
+_USES = ("everything", "complete.obs", "pairwise.complete.obs")
 
 
 # FUNCTIONS
@@ -24,56 +76,256 @@ from pyrat.closure import inv
 def na_omit(x):
     if not isvector(x):
         x = c(x)
-    return x.filter(inv(is_na))
+    return x[~is_na(x)]
 
 
-def median(x, na_rm=False):
+def ss(x, na_rm=False):
     if not isvector(x):
         x = c(x)
     if na_rm:
         x = na_omit(x)
     elif any_na(x):
         return NA
-    srt = sorted(x)
-    n = len(srt)
-    i = n // 2
-    if n % 2 == 0:
-        return sum(srt[i - 1:i + 1]) / 2
-    return srt[i]
+    return rsum(x.lazy() ** 2)
 
 
-def ss(x, na_rm=False):
+def dev(x, f=mean, na_rm=False):
     if not isvector(x):
         x = c(x)
     if na_rm:
         x = na_omit(x)
     elif any_na(x):
         return NA
-    return sum(x ** 2)
+    return x - f(x)
 
 
-def dev(x, f=mean, na_rm=False):
+def _count(x, na_rm):
+    if na_rm and x._valid is not None:
+        return len(x) - x._valid.count(0)
+    return len(x)
+
+
+def _blocks(x, na_rm):
+    # the values of x a block at a time, NA skipped
+    data = x._data
+    if na_rm and x._valid is not None:
+        data = itertools.compress(data, x._valid)
+    it = iter(data)
+    block = tuple(itertools.islice(it, _BLOCK))
+    while block:
+        yield block
+        block = tuple(itertools.islice(it, _BLOCK))
+
+
+def _block_moments(xs, ys):
+    # count, mean and sum of squared deviations of a block, and of ys
+    # with the sum of cross products, deviations from the block mean
+    n = len(xs)
+    mx = sum(xs) / n
+    dx = tuple(map(op.sub, xs, itertools.repeat(mx)))
+    sxx = sum(map(op.mul, dx, dx))
+    if ys is None:
+        return n, mx, sxx
+    my = sum(ys) / n
+    dy = tuple(map(op.sub, ys, itertools.repeat(my)))
+    syy = sum(map(op.mul, dy, dy))
+    return n, mx, sxx, my, syy, sum(map(op.mul, dx, dy))
+
+
+def _native_moments(x, y):
+    # the same blocks from the backend, when it has them
+    vecs = (x,) if y is None else (x, y)
+    if any(v._type is None or v._valid is not None for v in vecs):
+        return None
+    args = (y._data, y._type) if y is not None else (None, None)
+    return backend.active.moments(x._data, x._type, *args, _BLOCK)
+
+
+def _block_stats(x, y, na_rm):
+    # the moments of each block of x (and y), natively if possible
+    blocks = _native_moments(x, y)
+    if blocks is None:
+        ys = itertools.repeat(None) if y is None else _blocks(y, na_rm)
+        blocks = map(_block_moments, _blocks(x, na_rm), ys)
+    return blocks
+
+
+def _pair(x, y, na_rm):
+    # x and y as vectors, None if NA decides the answer
     if not isvector(x):
         x = c(x)
-    if na_rm:
-        x = na_omit(x)
-    elif any_na(x):
-        return NA
-    return x - f(x)
+    if not isvector(y):
+        y = c(y)
+    if not na_rm and any_na(x, y):
+        return None
+    if _count(x, na_rm) != _count(y, na_rm):
+        raise ValueError("vector lengths unequal")
+    return x, y
+
+
+class moments:
+    # count, mean, sum of squared deviations (m2), min and max, fed a
+    # chunk at a time or merged with another by Chan's update, so the
+    # pieces combine as if seen at once; NA without na_rm sticks
+    __slots__ = ("n", "mean", "m2", "min", "max")
+
+    def __init__(self, x=None, na_rm=False):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min, self.max = Inf, -Inf
+        if x is not None:
+            self.update(x, na_rm)
+
+    def __repr__(self):
+        return "moments(n={}, mean={}, var={})".format(
+            self.n, self.mean, self.var()
+        )
+
+    def _add(self, k, mean, m2):
+        if not k or self.mean is NA:
+            return
+        n = self.n + k
+        w = self.n * k / n
+        d = mean - self.mean
+        self.m2 += m2 + d * d * w
+        self.mean += d * k / n
+        self.n = n
+
+    def _poison(self):
+        self.mean = self.m2 = self.min = self.max = NA
+
+    def _feed(self, x, na_rm):
+        # the moments only, min and max are left to update
+        if not isvector(x):
+            x = c(x)
+        if not na_rm and any_na(x):
+            self._poison()
+        if self.mean is NA:
+            # NA sticks, the rest of the data cannot change that
+            return x
+        for k, mean, m2 in _block_stats(x, None, na_rm):
+            self._add(k, mean, m2)
+        return x
+
+    def update(self, x, na_rm=False):
+        x = self._feed(x, na_rm)
+        if self.mean is not NA and len(x):
+            self.min = min(self.min, rmin(x, na_rm=True))
+            self.max = max(self.max, rmax(x, na_rm=True))
+        return self
+
+    def merge(self, other):
+        if other.mean is NA:
+            self._poison()
+        self._add(other.n, other.mean, other.m2)
+        if self.mean is not NA:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        return self
+
+    def var(self):
+        if self.mean is NA or self.n <= 1:
+            return NA
+        return self.m2 / (self.n - 1)
+
+    def sd(self):
+        v = self.var()
+        return v if v is NA else math.sqrt(v)
+
+
+class comoments:
+    # moments of x and of y, with the sum of cross products (cxy)
+    __slots__ = ("x", "y", "cxy")
+
+    def __init__(self, x=None, y=None, na_rm=False):
+        self.x, self.y, self.cxy = moments(), moments(), 0.0
+        if x is not None:
+            self.update(x, y, na_rm)
+
+    def __repr__(self):
+        return "comoments(n={}, cov={}, cor={})".format(
+            self.x.n, self.cov(), self.cor()
+        )
+
+    def _add(self, k, mx, sxx, my, syy, sxy):
+        if not k or self.cxy is NA:
+            return
+        w = self.x.n * k / (self.x.n + k)
+        self.cxy += sxy + (mx - self.x.mean) * (my - self.y.mean) * w
+        self.x._add(k, mx, sxx)
+        self.y._add(k, my, syy)
+
+    def _poison(self):
+        self.x._poison()
+        self.y._poison()
+        self.cxy = NA
+
+    def _feed(self, x, y, na_rm):
+        pair = _pair(x, y, na_rm)
+        if pair is None:
+            self._poison()
+        if pair is None or self.cxy is NA:
+            # NA sticks, the rest of the data cannot change that
+            return
+        for block in _block_stats(*pair, na_rm):
+            self._add(*block)
+        return pair
+
+    def update(self, x, y, na_rm=False):
+        pair = self._feed(x, y, na_rm)
+        if pair is not None and self.cxy is not NA and len(pair[0]):
+            for acc, v in zip((self.x, self.y), pair):
+                acc.min = min(acc.min, rmin(v, na_rm=True))
+                acc.max = max(acc.max, rmax(v, na_rm=True))
+        return self
+
+    def merge(self, other):
+        if other.cxy is NA:
+            self._poison()
+        x, y = other.x, other.y
+        self._add(x.n, x.mean, x.m2, y.mean, y.m2, other.cxy)
+        if self.cxy is not NA:
+            for acc, new in ((self.x, x), (self.y, y)):
+                acc.min = min(acc.min, new.min)
+                acc.max = max(acc.max, new.max)
+        return self
+
+    def cov(self):
+        if self.cxy is NA or self.x.n <= 1:
+            return NA
+        return self.cxy / (self.x.n - 1)
+
+    def cor(self):
+        if self.cxy is NA or self.x.n <= 1 or not self.x.m2 \
+                or not self.y.m2:
+            return NA
+        r = self.cxy / math.sqrt(self.x.m2 * self.y.m2)
+        return max(-1.0, min(1.0, r))
+
+
+def _accumulate(na_rm, *x):
+    return moments(*x, na_rm=na_rm) if len(x) == 1 \
+        else comoments(*x, na_rm=na_rm)
+
+
+def accumulate(x, y=None, na_rm=False, workers=None, chunksize=None):
+    # moments of x, or comoments of x and y, a chunk per task in the
+    # process pool, merged in order
+    cols = tuple(v if isvector(v) else c(v) for v in (x, y) if v is not None)
+    parts = parallel.chunks(*cols, workers=workers, chunksize=chunksize)
+    calls = ((na_rm, *part) for part in parts)
+    accs = parallel.pstarmap(_accumulate, calls, "process", workers)
+    res = moments() if y is None else comoments()
+    for acc in accs:
+        res.merge(acc)
+    return res
 
 
 def var(x, y=None, na_rm=False):
     if y is not None:
         return cov(x, y, na_rm=na_rm)
-    if not isvector(x):
-        x = c(x)
-    if na_rm:
-        x = na_omit(x)
-    elif any_na(x):
-        return NA
-    if len(x) <= 1:
-        return NA
-    return ss(dev(x)) / (len(x) - 1)
+    acc = moments()
+    acc._feed(x, na_rm)
+    return acc.var()
 
 
 def sd(x, na_rm=False):
@@ -83,56 +335,729 @@ def sd(x, na_rm=False):
     return sqrt(v)
 
 
-def cov(x, y=None, na_rm=False):
+class _Cross:
+    # n, means, and the sums of squares and cross products of columns
+    # about their means (the SSCP matrix), fed a block of rows at a time
+    # and merged by Chan's update, like moments; with pairs, only those
+    # cells (i <= j) and the diagonal are kept, the rest stay 0
+    __slots__ = ("n", "means", "sscp", "pairs")
+
+    def __init__(self, k, pairs=None):
+        self.n = 0
+        self.means = [0.0] * k
+        self.sscp = [[0.0] * k for _ in range(k)]
+        if pairs is None:
+            pairs = [(i, j) for i in range(k) for j in range(i, k)]
+        else:
+            pairs = sorted({*pairs, *((i, i) for i in range(k))})
+        self.pairs = pairs
+
+    def _add(self, k, means, sscp):
+        if not k:
+            return
+        n = self.n + k
+        w = self.n * k / n
+        d = [a - b for a, b in zip(means, self.means)]
+        for i, j in self.pairs:
+            cell = self.sscp[i][j] + sscp[i][j] + d[i] * d[j] * w
+            self.sscp[i][j] = self.sscp[j][i] = cell
+        self.means = [m + v * k / n for m, v in zip(self.means, d)]
+        self.n = n
+
+    def _fold(self, block):
+        # block is a tuple of columns, of equal length
+        k = len(block[0])
+        means = [sum(v) / k for v in block]
+        devs = [
+            tuple(map(op.sub, v, itertools.repeat(m)))
+            for v, m in zip(block, means)
+        ]
+        sscp = [[0.0] * len(devs) for _ in devs]
+        for i, j in self.pairs:
+            sscp[i][j] = sscp[j][i] = sum(map(op.mul, devs[i], devs[j]))
+        self._add(k, means, sscp)
+
+    def update(self, cols):
+        for block in zip(*(_blocks(v, False) for v in cols)):
+            self._fold(block)
+        return self
+
+    def merge(self, other):
+        self._add(other.n, other.means, other.sscp)
+        return self
+
+
+def _cells(cols, pairs, pairwise):
+    # count and sums of squares and cross products about the means for
+    # each pair (i, j) of columns, in one blocked pass; pairwise takes
+    # the rows where both are valid, so each pair has its own means
+    if not pairwise:
+        acc = _Cross(len(cols), pairs).update(cols)
+        s = acc.sscp
+        return [(acc.n, s[i][i], s[j][j], s[i][j]) for i, j in pairs]
+    accs = [comoments() for _ in pairs]
+    starts = itertools.count(0, _BLOCK)
+    for start, block in zip(starts, zip(*(_blocks(v, False) for v in cols))):
+        stop = start + len(block[0])
+        masks = [
+            None if v._valid is None else v._valid[start:stop] for v in cols
+        ]
+        masks = [m if m and 0 in m else None for m in masks]
+        # columns without NA here share their deviations across pairs
+        full = {
+            i: _block_moments(v, None) for i, v in enumerate(block)
+            if masks[i] is None
+        }
+        devs = {
+            i: tuple(map(op.sub, block[i], itertools.repeat(m[1])))
+            for i, m in full.items()
+        }
+        for acc, (i, j) in zip(accs, pairs):
+            if i in full and j in full:
+                sxy = sum(map(op.mul, devs[i], devs[j]))
+                acc._add(*full[i], *full[j][1:], sxy)
+                continue
+            keep = bytes(map(op.and_, *(
+                masks[k] or b"\x01" * (stop - start) for k in (i, j)
+            )))
+            xs = tuple(itertools.compress(block[i], keep))
+            ys = tuple(itertools.compress(block[j], keep))
+            if xs:
+                acc._add(*_block_moments(xs, ys))
+    return [(a.x.n, a.x.m2, a.y.m2, a.cxy) for a in accs]
+
+
+def _frame(x, f, use, workers, chunksize):
+    # the matrix of f ("cov" or "cor") over the columns of a dict frame,
+    # as a dict of dicts; with workers, the columns are cut into blocks
+    # and each pair of blocks is a task in the process pool
+    if use not in _USES:
+        raise ValueError("unknown use: {}".format(use))
+    names = list(x)
+    cols = [v if isvector(v) else c(v) for v in x.values()]
+    if len(set(map(len, cols))) > 1:
+        raise ValueError("vector lengths unequal")
+    if use == "complete.obs":
+        masks = [v._valid for v in cols if v._valid is not None]
+        if masks:
+            keep = c(list(map(all, zip(*masks))))
+            cols = [v[keep] for v in cols]
+    pairwise = use == "pairwise.complete.obs" and any(
+        v._valid is not None for v in cols
+    )
+    # with everything, a column with NA is NA against every other
+    live = [
+        i for i, v in enumerate(cols) if pairwise or v._valid is None
+    ]
+
+    # a task is the columns it reads and the pairs of them it fills: all
+    # of one block, or only the products across two blocks
+    if workers is None:
+        blocks = [live]
+    else:
+        blocks = [
+            list(b) for b, in parallel.chunks(
+                live, workers=workers, chunksize=chunksize
+            )
+        ]
+    tasks = list()
+    for i, a in enumerate(blocks):
+        k = len(a)
+        tasks.append((a, [(p, q) for p in range(k) for q in range(p, k)]))
+        for b in blocks[i + 1:]:
+            pairs = [(p, k + q) for p in range(k) for q in range(len(b))]
+            tasks.append((a + b, pairs))
+    calls = [([cols[k] for k in task], pairs, pairwise)
+             for task, pairs in tasks]
+    if workers is None:
+        parts = [_cells(*call) for call in calls]
+    else:
+        parts = parallel.pstarmap(_cells, calls, "process", workers)
+
+    res = {a: dict.fromkeys(names, NA) for a in names}
+    for (task, pairs), part in zip(tasks, parts):
+        for (i, j), (n, sxx, syy, sxy) in zip(pairs, part):
+            if n <= 1 or f == "cor" and not (sxx and syy):
+                val = NA
+            elif f == "cov":
+                val = sxy / (n - 1)
+            else:
+                val = max(-1.0, min(1.0, sxy / math.sqrt(sxx * syy)))
+            a, b = names[task[i]], names[task[j]]
+            res[a][b] = res[b][a] = val
+    return res
+
+
+def cov(x, y=None, na_rm=False, use=None, workers=None, chunksize=None):
+    # of two vectors, or the matrix of a dict frame; use is one of R's
+    # everything (the default), complete.obs (na_rm) or
+    # pairwise.complete.obs
+    if isinstance(x, dict) and y is None:
+        use = use or ("complete.obs" if na_rm else "everything")
+        return _frame(x, "cov", use, workers, chunksize)
     if y is None:
         return var(x, na_rm=na_rm)
+    acc = comoments()
+    acc._feed(x, y, na_rm)
+    return acc.cov()
+
+
+def cor(x, y=None, na_rm=False, use=None, workers=None, chunksize=None):
+    if isinstance(x, dict) and y is None:
+        use = use or ("complete.obs" if na_rm else "everything")
+        return _frame(x, "cor", use, workers, chunksize)
+    acc = comoments()
+    acc._feed(x, y, na_rm)
+    return acc.cor()
+
+
+# FUNCTIONS (QUANTILES)
+
+
+def _values(x, na_rm):
+    # the values of x as a sequence and their type, None if NA decides
     if not isvector(x):
         x = c(x)
-    if not isvector(y):
-        y = c(y)
-    if na_rm:
-        x = na_omit(x)
-        y = na_omit(y)
-    elif any_na(x, y):
+    data = x._data
+    if x._valid is not None:
+        if not na_rm:
+            return None, x._type
+        data = list(itertools.compress(data, x._valid))
+    elif not isinstance(data, (array.array, list, tuple)):
+        data = list(data)
+    return data, x._type
+
+
+def _bracket(vals, ks, sample):
+    # after Floyd and Rivest: a sorted random sample of vals brackets
+    # each group of nearby ranks ks; groups are split apart by exact
+    # partitions, each bracket is cut out in a pass or two and only it
+    # is sorted; None if a bracket missed, which is rare
+    n, m = len(vals), len(sample)
+    if ks[0] < 0 or ks[-1] >= n:
+        # ties put the partition off the ranks expected of it
+        return None
+    if n <= _SMALL or m < 2:
+        srt = sorted(vals)
+        return {k: srt[k] for k in ks}
+    gap = int(math.sqrt(m * math.log(n)))
+    wins = [(max(0, k * m // n - gap), min(m - 1, k * m // n + gap))
+            for k in ks]
+    splits = [j for j in range(1, len(ks)) if wins[j - 1][1] < wins[j][0]]
+    if len(splits) >= _SPANS:
+        return None
+
+    if splits:
+        # partition between the two groups nearest the middle
+        j = min(splits, key=lambda j: abs(2 * j - len(ks)))
+        i = (wins[j - 1][1] + wins[j][0] + 1) // 2
+        p = sample[i]
+        left = [v for v in vals if v < p]
+        right = [v for v in vals if not v < p]
+        i = bisect.bisect_left(sample, p)
+        lo = _bracket(left, ks[:j], sample[:i])
+        hi = _bracket(right, [k - len(left) for k in ks[j:]], sample[i:])
+        if lo is None or hi is None:
+            return None
+        lo.update((k + len(left), v) for k, v in hi.items())
+        return lo
+
+    # one group, no cut at either end of the sample, smaller side first
+    lo, hi = wins[0][0], wins[-1][1]
+    a = sample[lo] if lo > 0 else None
+    b = sample[hi] if hi < m - 1 else None
+    mid = vals
+    if b is not None and lo + hi < m:
+        mid = [v for v in mid if v <= b]
+        b = None
+    below = len(mid)
+    if a is not None:
+        mid = [v for v in mid if v >= a]
+    below -= len(mid)
+    if b is not None:
+        mid = [v for v in mid if v <= b]
+    if not below <= ks[0] <= ks[-1] < below + len(mid):
+        return None
+    mid = sorted(mid)
+    return {k: mid[k - below] for k in ks}
+
+
+def _select(vals, t, ks, sample=None):
+    # the values at sorted positions ks, in expected O(n)
+    n = len(vals)
+    out = dict()
+    if 0 in ks:
+        out[0] = min(vals)
+    if n - 1 in ks:
+        out[n - 1] = max(vals)
+    inner = sorted(set(k for k in ks if k not in out))
+    res = backend.active.select(vals, t, inner) if inner else None
+    if res is not None:
+        out.update(zip(inner, res))
+    elif inner:
+        if sample is None and n > _SMALL:
+            # a generator of its own, the caller's random state is theirs
+            rng = random.Random(n)
+            sample = sorted(rng.sample(vals, int(n ** (2 / 3))))
+        at = _bracket(vals, inner, sample or ())
+        if at is None:
+            srt = sorted(vals)
+            at = {k: srt[k] for k in inner}
+        out.update(at)
+    res = [out[k] for k in ks]
+    return list(map(bool, res)) if t is bool else res, sample
+
+
+def median(x, na_rm=False, approx=False):
+    # approx answers from a sketch, one pass in bounded memory
+    if approx:
+        return sketch(x, na_rm=na_rm).median()
+    vals, t = _values(x, na_rm)
+    if not vals:
         return NA
-    if len(x) != len(y):
-        raise ValueError("vector lengths unequal")
-    return sum(dev(x) * dev(y)) / (len(x) - 1)
+    return _median(vals, t)[0]
+
+
+def _median(vals, t, sample=None):
+    n = len(vals)
+    i = n // 2
+    if n % 2:
+        (res,), sample = _select(vals, t, (i,), sample)
+        return res, sample
+    (a, b), sample = _select(vals, t, (i - 1, i), sample)
+    return sum((a, b)) / 2, sample
+
+
+def _quantile(n, p, type):
+    # R's types: the sorted positions to mix, and the weight of the upper
+    nppm = n * p - 0.5 if type == 3 else n * p
+    if type > 3:
+        a, b = _QUANTILE_TYPES[type]
+        nppm = a + p * (n + 1 - a - b)
+    j = math.floor(nppm + _FUZZ)
+    h = nppm - j
+    if type == 1:
+        h = float(nppm > j)
+    elif type == 2:
+        h = ((nppm > j) + 1) / 2
+    elif type == 3:
+        h = float(nppm != j or j % 2 == 1)
+    elif abs(h) < _FUZZ:
+        h = 0.0
+    return min(max(j - 1, 0), n - 1), min(max(j, 0), n - 1), h
+
+
+def quantile(x, probs=(0, 0.25, 0.5, 0.75, 1), na_rm=False, type=7):
+    # all probabilities from one selection
+    if type not in range(1, 10):
+        raise ValueError("type is 1 to 9")
+    probs = c(probs)
+    if any_na(probs) or not all(0 <= p <= 1 for p in probs):
+        raise ValueError("probs are between 0 and 1")
+    vals, t = _values(x, na_rm)
+    if not vals:
+        return vector([NA] * len(probs))
+    plan = [_quantile(len(vals), p, type) for p in probs]
+    ks = set()
+    for lo, hi, h in plan:
+        ks.update((lo,) if h == 0 else (hi,) if h == 1 else (lo, hi))
+    ks = sorted(ks)
+    at = dict(zip(ks, _select(vals, t, ks)[0]))
+    out = list()
+    for lo, hi, h in plan:
+        if h == 0 or h == 1:
+            out.append(at[hi if h else lo])
+        else:
+            a, b = at[lo], at[hi]
+            out.append(a if a == b else (1 - h) * a + h * b)
+    return vector(out)
 
 
-def cor(x, y, na_rm=False):
+def IQR(x, na_rm=False, type=7):
+    q1, q3 = quantile(x, (0.25, 0.75), na_rm, type)
+    return NA if q1 is NA else q3 - q1
+
+
+def fivenum(x, na_rm=True):
+    # Tukey's minimum, lower hinge, median, upper hinge, maximum
+    vals, t = _values(x, na_rm)
+    if not vals:
+        return vector([NA] * 5)
+    n = len(vals)
+    n4 = math.floor((n + 3) / 2) / 2
+    d = (1, n4, (n + 1) / 2, n + 1 - n4, n)
+    ks = sorted(set(k - 1 for v in d for k in (math.floor(v), math.ceil(v))))
+    at = dict(zip(ks, _select(vals, t, ks)[0]))
+    return vector(
+        0.5 * (at[math.floor(v) - 1] + at[math.ceil(v) - 1]) for v in d
+    )
+
+
+def summary(x):
+    # R's summary of numbers, NA are counted and left out
     if not isvector(x):
         x = c(x)
-    if not isvector(y):
-        y = c(y)
-    if na_rm:
-        x = na_omit(x)
-        y = na_omit(y)
-    elif any_na(x, y):
-        return NA
-    return cov(x, y) / (sd(x) * sd(y))
+    q = quantile(x, na_rm=True)
+    res = dict(zip(("min", "q1", "median"), q[:3]))
+    res["mean"] = mean(x, na_rm=True)
+    res.update(q3=q[3], max=q[4])
+    if x._valid is not None:
+        res["na"] = x._valid.count(0)
+    return res
+
+
+def _dist(a, b):
+    return abs(b - a)
 
 
 def mad(x, f=median, constant=1.4826, na_rm=False):
-    if not isvector(x):
-        x = c(x)
-    if na_rm:
-        x = na_omit(x)
-    elif any_na(x):
+    if f is not median:
+        if not isvector(x):
+            x = c(x)
+        if na_rm:
+            x = na_omit(x)
+        elif any_na(x):
+            return NA
+        return constant * f(abs(dev(x, f=f, na_rm=na_rm)))
+    # the deviations reuse the sample that bracketed the median
+    vals, t = _values(x, na_rm)
+    if not vals:
         return NA
-    return constant * f(abs(dev(x, f=f, na_rm=na_rm)))
+    m, sample = _median(vals, t)
+    dist = functools.partial(_dist, m)
+    if sample is not None:
+        sample = sorted(map(dist, sample))
+    if t is not None:
+        t = float if t is float or isinstance(m, float) else int
+    return constant * _median(list(map(dist, vals)), t, sample)[0]
+
+
+class sketch:
+    # a KLL sketch of the distribution: levels of items, each item at
+    # level h standing for 2 ** h values. A level over its capacity is
+    # sorted and every other item moves up, the offset alternating per
+    # level so that answers are reproducible. Ranks are off by about
+    # 1.7 / k of n; min, max and n are exact. Fed a chunk at a time or
+    # merged with another, NA without na_rm sticks like in moments
+    __slots__ = ("k", "n", "min", "max", "levels", "flips")
+
+    def __init__(self, x=None, k=200, na_rm=False):
+        if not isinstance(k, int) or k < 8:
+            raise ValueError("k must be an int of at least 8")
+        self.k, self.n = k, 0
+        self.min, self.max = Inf, -Inf
+        self.levels, self.flips = [list()], 0
+        if x is not None:
+            self.update(x, na_rm)
+
+    def __repr__(self):
+        return "sketch(n={}, k={}, median={})".format(
+            self.n, self.k, self.median()
+        )
+
+    def __reduce__(self):
+        return sketch.frombytes, (self.tobytes(),)
+
+    def _capacity(self, h):
+        depth = len(self.levels)
+        return max(2, int(self.k * _DECAY ** (depth - h - 1)))
+
+    def _compress(self):
+        # lazily, only while all the levels together are over capacity,
+        # and then the lowest level over its own
+        while True:
+            caps = list(map(self._capacity, range(len(self.levels))))
+            if sum(map(len, self.levels)) <= sum(caps):
+                return
+            h = next(
+                h for h, (level, cap) in enumerate(zip(self.levels, caps))
+                if len(level) > cap
+            )
+            level = self.levels[h]
+            level.sort()
+            # an odd one out stays behind, the weight is kept exactly
+            odd = len(level) % 2
+            offset = self.flips >> h & 1
+            self.flips ^= 1 << h
+            if h + 1 == len(self.levels):
+                self.levels.append(list())
+            self.levels[h + 1].extend(level[odd + offset::2])
+            del level[odd:]
+
+    def _poison(self):
+        self.min = self.max = NA
+        self.levels = [list()]
+
+    def update(self, x, na_rm=False):
+        if not isvector(x):
+            x = c(x)
+        if not na_rm and any_na(x):
+            self._poison()
+        if self.min is NA:
+            return self
+        for block in _blocks(x, na_rm):
+            self.n += len(block)
+            self.min = min(self.min, min(block))
+            self.max = max(self.max, max(block))
+            self.levels[0].extend(block)
+            self._compress()
+        return self
+
+    def merge(self, other):
+        if other.min is NA:
+            self._poison()
+        if self.min is NA or not other.n:
+            return self
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(list())
+            self.levels[h].extend(level)
+        self._compress()
+        return self
+
+    def quantile(self, probs=(0, 0.25, 0.5, 0.75, 1)):
+        # exact (type 7) while every value is still held, else the item
+        # at the nearest rank of the weighted items
+        if self.min is NA or not self.n:
+            return vector([NA] * len(c(probs)))
+        if len(self.levels) == 1:
+            return quantile(self.levels[0], probs)
+        probs = c(probs)
+        if any_na(probs) or not all(0 <= p <= 1 for p in probs):
+            raise ValueError("probs are between 0 and 1")
+        items = sorted(
+            (v, 1 << h) for h, level in enumerate(self.levels) for v in level
+        )
+        ends = list(itertools.accumulate(w for _, w in items))
+        out = list()
+        for p in probs:
+            i = bisect.bisect_right(ends, int((self.n - 1) * p + 0.5))
+            v = items[min(i, len(items) - 1)][0]
+            out.append(self.min if p == 0 else self.max if p == 1 else v)
+        return vector(out)
+
+    def median(self):
+        return self.quantile(0.5)[0]
+
+    def tobytes(self):
+        # k, n, NA, flips and the size of each level as int64, then
+        # min, max and the items of each level as float64
+        na = self.min is NA
+        head = array.array("q", (
+            self.k, self.n, na, self.flips, *map(len, self.levels)
+        ))
+        body = array.array("d", (0.0, 0.0) if na else (self.min, self.max))
+        for level in self.levels:
+            body.extend(level)
+        return len(head).to_bytes(8, "little") + head.tobytes() + \
+            body.tobytes()
+
+    @classmethod
+    def frombytes(cls, buf):
+        size = int.from_bytes(buf[:8], "little")
+        head = array.array("q", buf[8:8 + 8 * size])
+        body = array.array("d", buf[8 + 8 * size:])
+        self = cls(k=head[0])
+        self.n, self.flips = head[1], head[3]
+        if head[2]:
+            self._poison()
+            return self
+        self.min, self.max = body[:2]
+        pos = 2
+        self.levels = list()
+        for m in head[4:]:
+            self.levels.append(body[pos:pos + m].tolist())
+            pos += m
+        return self
 
 
 # FUNCTIONS (MODELS)
 
 
-def lm(x, y):
-    x, y = map(c, (x, y))
-    coef = dict()
-    coef["b1"] = cov(x, y) / var(x)
-    coef["b0"] = mean(y) - coef["b1"] * mean(x)
-    return coef
+def _cross_by(k, codes, *cols):
+    # a _Cross per group in one scan: rows are dealt out to their groups
+    # and a group's rows folded into its sums once they make a block
+    accs = [_Cross(len(cols)) for _ in range(k)]
+    shares = [list() for _ in range(k)]
+    for g, row in zip(codes, zip(*(v._data for v in cols))):
+        share = shares[g]
+        share.append(row)
+        if len(share) == _BLOCK:
+            accs[g]._fold(tuple(zip(*share)))
+            share.clear()
+    for acc, share in zip(accs, shares):
+        if share:
+            acc._fold(tuple(zip(*share)))
+    return accs
+
+
+def _ldl(a):
+    # a = L D L' for symmetric a, L unit lower triangular, no square
+    # roots; None if a is singular, up to rounding
+    k = len(a)
+    low = [[0.0] * k for _ in range(k)]
+    d = [0.0] * k
+    for j in range(k):
+        d[j] = a[j][j] - sum(low[j][i] ** 2 * d[i] for i in range(j))
+        if d[j] <= _SINGULAR * a[j][j] or not a[j][j]:
+            return None
+        low[j][j] = 1.0
+        for r in range(j + 1, k):
+            dot = sum(low[r][i] * low[j][i] * d[i] for i in range(j))
+            low[r][j] = (a[r][j] - dot) / d[j]
+    return low, d
+
+
+def _ldl_solve(low, d, b):
+    k = len(b)
+    z = list(b)
+    for i in range(k):
+        z[i] -= sum(low[i][j] * z[j] for j in range(i))
+    z = [v / dv for v, dv in zip(z, d)]
+    for i in reversed(range(k)):
+        z[i] -= sum(low[j][i] * z[j] for j in range(i + 1, k))
+    return z
+
+
+def _predictors(x):
+    # names and columns of a vector, a list of vectors, or a dict frame
+    if isinstance(x, dict):
+        return list(x), list(x.values())
+    if isinstance(x, (list, tuple)) and x and all(map(isnonstriter, x)):
+        return ["b{}".format(i + 1) for i in range(len(x))], list(x)
+    return ["b1"], [x]
+
+
+def _fit(acc, names):
+    # the model from the sums of one _Cross, y in its last column
+    n, p = acc.n, len(names)
+    sxx = [row[:p] for row in acc.sscp[:p]]
+    sxy = [row[p] for row in acc.sscp[:p]]
+    syy = acc.sscp[p][p]
+    fac = _ldl(sxx)
+    if fac is None:
+        return None
+    beta = _ldl_solve(*fac, sxy)
+    xbar = acc.means[:p]
+    b0 = acc.means[p] - sum(map(op.mul, beta, xbar))
+
+    rss = max(0.0, syy - sum(map(op.mul, beta, sxy)))
+    df = n - p - 1
+    se = dict.fromkeys(["b0", *names], NA)
+    sigma = NA
+    if df > 0:
+        s2 = rss / df
+        sigma = math.sqrt(s2)
+        # the diagonal of the inverse, and xbar' inverse xbar
+        inv = [_ldl_solve(*fac, [float(i == j) for j in range(p)])
+               for i in range(p)]
+        se.update((k, math.sqrt(s2 * inv[i][i])) for i, k in enumerate(names))
+        quad = sum(a * sum(map(op.mul, row, xbar))
+                   for row, a in zip(inv, xbar))
+        se["b0"] = math.sqrt(s2 * (1 / n + quad))
+    return {
+        "coef": {"b0": b0, **dict(zip(names, beta))},
+        "se": se,
+        "sigma": sigma,
+        "df": df,
+        "rss": rss,
+        "r_squared": 1 - rss / syy if syy else NA,
+        "n": n,
+    }
+
+
+def _unfit(acc, names):
+    # what a group too small or too collinear to fit gets
+    blank = dict.fromkeys(["b0", *names], NA)
+    return {
+        "coef": blank, "se": dict(blank), "sigma": NA,
+        "df": acc.n - len(names) - 1, "rss": NA, "r_squared": NA, "n": acc.n,
+    }
+
+
+def lm(x, y, by=None, workers=None, chunksize=None):
+    # least squares of y on the columns of x and an intercept: one pass
+    # for the SSCP matrix about the means, solved by LDL' (Cholesky);
+    # rows with NA are left out. With by, a vector or a list of them, a
+    # model per group from one scan, optionally in chunks of rows across
+    # processes; groups that cannot be fit get NA
+    names, cols = _predictors(x)
+    cols = [v if isvector(v) else c(v) for v in (*cols, y)]
+    index = list()
+    if by is not None:
+        index = _index_keys(by, len(cols[-1]))
+        index = [v if isvector(v) else c(v) for v in index]
+    if len(set(map(len, cols + index))) > 1:
+        raise ValueError("vector lengths unequal")
+    masks = [v._valid for v in cols + index if v._valid is not None]
+    if masks:
+        keep = c(list(map(all, zip(*masks))))
+        cols = [v[keep] for v in cols]
+        index = [v[keep] for v in index]
+
+    if by is None:
+        model = _fit(_Cross(len(cols)).update(cols), names)
+        if model is None:
+            raise ValueError("predictors are collinear or constant")
+        return model
+
+    # a group number per row, numbered by first appearance
+    ids = dict()
+    keys = index[0] if len(index) == 1 else zip(*index)
+    codes = list(map(ids.setdefault, keys, map(len, itertools.repeat(ids))))
+    if workers is None:
+        accs = _cross_by(len(ids), codes, *cols)
+    else:
+        parts = parallel.chunks(
+            codes, *cols, workers=workers, chunksize=chunksize
+        )
+        calls = ((len(ids), *part) for part in parts)
+        accs = [_Cross(len(cols)) for _ in ids]
+        for res in parallel.pstarmap(_cross_by, calls, "process", workers):
+            for acc, other in zip(accs, res):
+                acc.merge(other)
+    models = {
+        key: _fit(acc, names) or _unfit(acc, names)
+        for key, acc in zip(ids, accs)
+    }
+    try:
+        return {k: models[k] for k in sorted(models)}
+    except TypeError:
+        return models
+
 
+def predict(model, x, chunksize=None):
+    # the fit at new x, a fused pass per chunk of rows; also takes the
+    # plain {"b0": ..., "b1": ...} coefficients
+    coef = model.get("coef", model)
+    names = [k for k in coef if k != "b0"]
+    _, cols = _predictors(x)
+    if isinstance(x, dict):
+        cols = [x[k] for k in names]
+    elif len(cols) != len(names):
+        raise ValueError("model has {} predictors".format(len(names)))
+    cols = [v if isvector(v) or not isnonstriter(v) else c(v) for v in cols]
+    n = max((len(v) for v in cols if isvector(v)), default=None)
+    if n is None:
+        return coef["b0"] + sum(coef[k] * v for k, v in zip(names, cols))
 
-def predict(coef, x):
-    return coef["b0"] + x * coef["b1"]
+    size = chunksize or _CHUNK
+    buf, valid, parts = array.array("d"), bytearray(), list()
+    for i in range(0, n, size):
+        fit = coef["b0"]
+        for k, v in zip(names, cols):
+            if isvector(v):
+                v = v[i:i + size].lazy()
+            fit = fit + v * coef[k]
+        part = force(fit)
+        if part._type is float and not parts:
+            # straight into the result, so no chunk is held twice
+            buf.extend(part._data)
+            valid += part._valid or b"\x01" * len(part)
+        else:
+            parts.append(part)
+    out = vector._new(buf, float, bytes(valid))
+    return c(out, *parts) if parts else out
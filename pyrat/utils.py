@@ -2,6 +2,7 @@ __all__ = [
     "auto_cast",
     "head",
     "read_csv",
+    "read_csv_chunks",
     "struct",
     "tail",
     "try_cast",
@@ -13,6 +14,7 @@ __all__ = [
 
 
 import csv
+import itertools
 
 from pyrat.base import c, isiter, vector
 from pyrat.closure import get, unpack
@@ -93,6 +95,21 @@ def read_csv(filename):
         }
 
 
+def read_csv_chunks(filename, size=100000):
+    # a dict of vectors per size rows, for files too large to load;
+    # each chunk is cast on its own
+    with open(filename, encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        while True:
+            rows = tuple(itertools.islice(reader, size))
+            if not rows:
+                return
+            yield {
+                k: vector(auto_cast(v))
+                for k, v in _lod_to_dol(rows).items()
+            }
+
+
 def write_csv(x, filename):
     if not isinstance(x, dict):
         raise TypeError("input must be a dict of iterables")
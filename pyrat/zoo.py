@@ -0,0 +1,274 @@
+__author__ = "Shane Drabing"
+__license__ = "MIT"
+__email__ = "shane.drabing@gmail.com"
+
+
+# MODULE EXPOSURE
+
+
+__all__ = [
+    "rollapply",
+    "rollmax",
+    "rollmean",
+    "rollmedian",
+    "rollmin",
+    "rollsd",
+    "rollsum",
+    "rollvar",
+]
+
+
+# IMPORTS
+
+
+import collections
+import heapq
+import itertools
+import math
+
+from pyrat.base import NA, Inf, NaN, c, isvector, vector
+
+
+# FUNCTIONS (WINDOWS)
+
+
+def _values(x):
+    # the values of x, 0 under NA, and the validity of each
+    if not isvector(x):
+        x = c(x)
+    valid = x._valid
+    if valid is None:
+        valid = b"\x01" * len(x)
+    vals = list(itertools.compress(x, valid))
+    it = iter(vals)
+    vals = [next(it) if ok else 0 for ok in valid]
+    return vals, valid
+
+
+def _finite(vals):
+    # inf - inf and nan - nan are nan, which is not 0
+    return [v - v == 0 for v in vals]
+
+
+def _windows(n, k):
+    if not isinstance(k, int) or k < 1:
+        raise ValueError("window width must be a positive int")
+    return max(0, n - k + 1)
+
+
+def _align(vals, n, k, align, fill):
+    # zoo's alignment: one result per full window, labelled by its
+    # right end, left end, or centre, padded with fill if given
+    if align not in ("center", "left", "right"):
+        raise ValueError("align is center, left or right")
+    if fill is None:
+        return vector(vals)
+    m = min(n, k - 1)
+    before = {"center": (k - 1) // 2, "left": 0, "right": k - 1}[align]
+    before = min(before, m)
+    return vector([fill] * before + vals + [fill] * (m - before))
+
+
+def _counts(valid, k):
+    # NA in each window, in one pass
+    out = list()
+    bad = 0
+    for i, ok in enumerate(valid):
+        bad += not ok
+        if i >= k:
+            bad -= not valid[i - k]
+        if i >= k - 1:
+            out.append(bad)
+    return out
+
+
+def rollapply(x, k, f, align="center", fill=None):
+    # any f of each window, O(n k)
+    if not isvector(x):
+        x = c(x)
+    n = len(x)
+    vals = [f(x[i:i + k]) for i in range(_windows(n, k))]
+    return _align(vals, n, k, align, fill)
+
+
+def rollsum(x, k, align="center", fill=None, na_rm=False):
+    vals, valid = _values(x)
+    n = len(vals)
+    m = _windows(n, k)
+    bad = _counts(valid, k)
+    fin = _finite(vals)
+    out = list()
+    total = 0
+    for i in range(m):
+        if i % k == 0 or not fin[i - 1]:
+            # start afresh now and then, float error stays per window,
+            # and once inf or nan leaves, a difference cannot undo it
+            total = sum(vals[i:i + k])
+        else:
+            total += vals[i + k - 1] - vals[i - 1]
+        out.append(NA if bad[i] and not na_rm else total)
+    return _align(out, n, k, align, fill)
+
+
+def rollmean(x, k, align="center", fill=None, na_rm=False):
+    _, valid = _values(x)
+    sums = rollsum(x, k, na_rm=na_rm)
+    good = [k - b for b in _counts(valid, k)]
+    out = [
+        NA if s is NA or not m else s / m
+        for s, m in zip(sums, good)
+    ]
+    return _align(out, len(valid), k, align, fill)
+
+
+def rollvar(x, k, align="center", fill=None, na_rm=False):
+    # Welford's update, values enter and leave the window; inf and nan
+    # are only counted, any of them makes the window nan
+    vals, valid = _values(x)
+    n = len(vals)
+    bad = _counts(valid, k)
+    fin = _finite(vals)
+    odd = _counts([not ok or f for ok, f in zip(valid, fin)], k)
+    valid = [ok and f for ok, f in zip(valid, fin)]
+    out = list()
+    count, avg, m2 = 0, 0.0, 0.0
+    for i in range(_windows(n, k)):
+        if i % k == 0:
+            window = list(itertools.compress(vals[i:i + k], valid[i:i + k]))
+            count = len(window)
+            avg = sum(window) / count if count else 0.0
+            m2 = sum((v - avg) ** 2 for v in window)
+        else:
+            old, new = i - 1, i + k - 1
+            if valid[old]:
+                count -= 1
+                if count:
+                    d = vals[old] - avg
+                    avg -= d / count
+                    m2 -= d * (vals[old] - avg)
+                else:
+                    avg, m2 = 0.0, 0.0
+            if valid[new]:
+                count += 1
+                d = vals[new] - avg
+                avg += d / count
+                m2 += d * (vals[new] - avg)
+        if bad[i] and not na_rm or count + odd[i] < 2:
+            out.append(NA)
+        elif odd[i]:
+            out.append(NaN)
+        else:
+            out.append(max(0.0, m2) / (count - 1))
+    return _align(out, n, k, align, fill)
+
+
+def rollsd(x, k, align="center", fill=None, na_rm=False):
+    var = rollvar(x, k, na_rm=na_rm)
+    out = [NA if v is NA else math.sqrt(v) for v in var]
+    return _align(out, len(x), k, align, fill)
+
+
+def _rollextreme(x, k, align, fill, na_rm, better, empty):
+    # a monotonic deque of positions, the best of the window at the front
+    vals, valid = _values(x)
+    n = len(vals)
+    bad = _counts(valid, k)
+    out = list()
+    dq = collections.deque()
+    for i in range(n):
+        if valid[i]:
+            while dq and not better(vals[dq[-1]], vals[i]):
+                dq.pop()
+            dq.append(i)
+        if dq and dq[0] <= i - k:
+            dq.popleft()
+        j = i - k + 1
+        if j >= 0:
+            if bad[j] and not na_rm:
+                out.append(NA)
+            else:
+                out.append(vals[dq[0]] if dq else empty)
+    return _align(out, n, k, align, fill)
+
+
+def rollmax(x, k, align="center", fill=None, na_rm=False):
+    return _rollextreme(x, k, align, fill, na_rm, lambda a, b: a > b, -Inf)
+
+
+def rollmin(x, k, align="center", fill=None, na_rm=False):
+    return _rollextreme(x, k, align, fill, na_rm, lambda a, b: a < b, Inf)
+
+
+class _Median:
+    # two heaps, the lower half negated, removals deferred until the
+    # value reaches the top of its heap
+    def __init__(self):
+        self.lo, self.hi = list(), list()
+        self.nlo, self.nhi = 0, 0
+        self.gone = collections.Counter()
+
+    def _prune(self, heap, sign):
+        while heap and self.gone[sign * heap[0]]:
+            self.gone[sign * heap[0]] -= 1
+            heapq.heappop(heap)
+
+    def _balance(self):
+        if self.nlo > self.nhi + 1:
+            heapq.heappush(self.hi, -heapq.heappop(self.lo))
+            self.nlo, self.nhi = self.nlo - 1, self.nhi + 1
+            self._prune(self.lo, -1)
+        elif self.nlo < self.nhi:
+            heapq.heappush(self.lo, -heapq.heappop(self.hi))
+            self.nlo, self.nhi = self.nlo + 1, self.nhi - 1
+            self._prune(self.hi, 1)
+
+    def add(self, v):
+        if not self.lo or v <= -self.lo[0]:
+            heapq.heappush(self.lo, -v)
+            self.nlo += 1
+        else:
+            heapq.heappush(self.hi, v)
+            self.nhi += 1
+        self._balance()
+
+    def remove(self, v):
+        self.gone[v] += 1
+        if v <= -self.lo[0]:
+            self.nlo -= 1
+            self._prune(self.lo, -1)
+        else:
+            self.nhi -= 1
+            self._prune(self.hi, 1)
+        self._balance()
+
+    def median(self):
+        if not self.nlo:
+            return NA
+        if self.nlo > self.nhi:
+            return -self.lo[0]
+        return (-self.lo[0] + self.hi[0]) / 2
+
+
+def rollmedian(x, k, align="center", fill=None, na_rm=False):
+    vals, valid = _values(x)
+    n = len(vals)
+    bad = _counts(valid, k)
+    # nan is only counted, it would not order in the heaps or match
+    # itself when it leaves; any of it makes the window nan
+    keep = [ok and v == v for ok, v in zip(valid, vals)]
+    odd = _counts([not ok or v == v for ok, v in zip(valid, vals)], k)
+    out = list()
+    med = _Median()
+    for i in range(n):
+        if keep[i]:
+            med.add(vals[i])
+        j = i - k
+        if j >= 0 and keep[j]:
+            med.remove(vals[j])
+        if i >= k - 1:
+            j = i - k + 1
+            if bad[j] and not na_rm:
+                out.append(NA)
+            else:
+                out.append(NaN if odd[j] else med.median())
+    return _align(out, n, k, align, fill)
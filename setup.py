@@ -21,5 +21,8 @@ setuptools.setup(
         ("", ["LICENSE"])
     ],
     install_requires=[
-    ]
+    ],
+    extras_require={
+        "numpy": ["numpy"],
+    }
 )
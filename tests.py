@@ -18,6 +18,9 @@ __all__ = [
 # IMPORTS
 
 
+import os
+import tempfile
+
 from pyrat.base import identical, vector
 
 
@@ -57,11 +60,35 @@ def none(x):
     return not any(x)
 
 
+def double_away(x, caller=os.getpid()):
+    # for the process pool, an error if run in the calling process
+    if os.getpid() == caller:
+        raise RuntimeError("ran in the caller")
+    return x * 2
+
+
+def tally(x, log=os.path.join(tempfile.gettempdir(),
+                              "pyrat-tally-%d" % os.getpid())):
+    # for the process pool, a line in a log per call
+    with open(log, "a", encoding="utf-8") as f:
+        f.write("%s\n" % x)
+    return str(x) if x % 2 else x
+
+
 # SCRIPT
 
 
 if __name__ == "__main__":
+    import array
+    import concurrent.futures
+    import io
+    import json
+    import math
     import operator
+    import pickle
+    import random
+    import subprocess
+    import sys
 
     from pyrat.base import *
     from pyrat.closure import *
@@ -108,6 +135,15 @@ if __name__ == "__main__":
     assert_identical(v123 // v123, rep(1, 3))
     assert_identical(v123 ** v123, c(1, 4, 27))
 
+    # numeric vectors keep the types of their elements
+    assert_identical(v123 / 2, c(0.5, 1.0, 1.5))
+    assert_identical(v123 ** -1, c(1.0, 0.5, 1 / 3))
+    assert_identical(-(v123 > 1), c(0, -1, -1))
+    assert_identical((v123 > 1) ^ True, c(True, False, False))
+    assert_identical(c(1, 2.5) + 1, c(2, 3.5))
+    assert_identical(c(2 ** 70, 1) * 2, c(2 ** 71, 2))
+    assert_identical(pickle.loads(pickle.dumps(v123 > 1)), v123 > 1)
+
     # equivalence operators
     assert all(v123 == v123)
     assert all(v123 <= v123)
@@ -134,13 +170,38 @@ if __name__ == "__main__":
     assert_identical(v123[1, NA, 1], c(2, NA, 2))
     assert_identical(v123[:2], v12)
 
+    # slices share the buffer, gathers are composed before they copy,
+    # both pickle as plain values
+    tmp = c(1.5, 2.5, NA, 4.5, 5.5)
+    assert_is(tmp[1:4]._data.obj, tmp._data)
+    assert_identical(tmp[1:4][::-1], c(4.5, NA, 2.5))
+    assert_identical(tmp[c(4, 0, 1, 4)][c(0, 2)], c(5.5, 2.5))
+    assert_is(tmp[c(4, 0)][c(True, False)]._data.data, tmp._data)
+    assert_identical(tmp[c(4, 0, 2)][[True, False, True]], c(5.5, NA))
+    assert_identical(tmp[[0, -1]], c(1.5, 5.5))
+    assert_identical(tmp[seq(0, 2)], c(1.5, 2.5, NA))
+    assert_identical(tmp[[]], vector())
+    assert_identical(pickle.loads(pickle.dumps(tmp[1:3])), c(2.5, NA))
+    assert_identical(pickle.loads(pickle.dumps(tmp[c(1, 0)])), c(2.5, 1.5))
+    for view in (rep(tmp[0:2], 2), rep(tmp[1:3], each=2),
+                 rep(tmp[c(1, 0)], 3), tmp[0:4][c(3, 0)]):
+        assert_identical(pickle.loads(pickle.dumps(view)), c(*view))
+    assert_eq(tapply(rep(v123[0:2], 2), c(1, 1, 2, 2), rsum, workers=2),
+              {1: 3, 2: 3})
+    assert_eq(tmp[c(4, 0)].index(1.5), 1)
+    assert_error(lambda: tmp[c(0, 5)], IndexError)
+
     # __getitem__ with casting
     assert_identical(v123.astype(str)[0], "1")
     assert_identical(v123.astype(str)[c(0, 1)], v12.astype(str))
 
     # no named vectors!  :-(
-    # tuple is immutable, must override __new__,
-    # but cannot set attributes on tuples anyways
+    # vector is immutable, with slots for its data only
+
+    # vector is not a tuple, it converts to one
+    assert not isinstance(v12, tuple)
+    assert_eq(tuple(v12), (1, 2))
+    assert_eq(json.dumps(list(c(1.5, 2.5))), "[1.5, 2.5]")
 
     # ...some tuple methods...
     assert_eq(v123.index(1), 0)
@@ -190,6 +251,29 @@ if __name__ == "__main__":
         c(2, 3, 4)
     )
 
+    # lazy defers operator chains until they are forced,
+    # then evaluates them in a single pass
+    tmp = v123.lazy()
+    assert islazy(tmp ** 2 + 1)
+    assert_identical(force(tmp ** 2 + 1), v123 ** 2 + 1)
+    assert_identical(force(1 - tmp / 2), 1 - v123 / 2)
+    assert_identical(force(tmp + v12), v123 + v12)
+    assert_identical(force(v12 + tmp), v12 + v123)
+    assert_identical(force(~(tmp > 1)), ~(v123 > 1))
+    assert_identical(force(sqrt(tmp)), sqrt(v123))
+    assert_identical(force(log(tmp)), log(v123))
+    assert_identical(force(log(tmp * 10, 10)), log(v123 * 10, 10))
+    assert_identical(force(tmp ** -1), v123 ** -1)
+    assert_identical(force(c(1, NA).lazy() * 2), c(2, NA))
+    assert_eq(sum(tmp ** 2), 14)
+    assert_eq(len(tmp + 1), 3)
+    assert_eq(force(1), 1)
+    assert_identical(c(tmp), v123)
+    assert_identical(c(v12, tmp * 2), c(1, 2, 2, 4, 6))
+    assert_eq(mean(tmp), 2)
+    assert_eq(mean(c(1, NA).lazy(), na_rm=True), 1)
+    assert any_na(c(1, NA).lazy())
+
     # BASE TESTS
 
     # na_safe makes a function safe to use with NAs
@@ -199,6 +283,10 @@ if __name__ == "__main__":
     # or flatten vectors for concatenation
     assert_identical(c(), vector())
     assert_identical(c(1, c(2, 3)), c(1, 2, 3))
+    assert_identical(c([1, (2, [3])], "hi"), c(1, 2, 3, "hi"))
+    assert_identical(c(2 ** 70, c(1)), vector((2 ** 70, 1)))
+    assert_identical(c(vector((c(1), c(2, 3)))), c(1, 2, 3))
+    assert_is(c(v123), v123)
 
     # isiter: is the object iterable?
     assert all(map(isiter, (dict(), list(), set(), str(), tuple())))
@@ -221,6 +309,22 @@ if __name__ == "__main__":
     assert_eq(any_na(None), False)
     assert_eq(any_na(c(NA, None)), True)
 
+    # NA slots are masked, numbers around them stay typed
+    tmp = c(1, NA, 3)
+    assert_identical(tmp + 1, c(2, NA, 4))
+    assert_identical(1 / c(NA, 2), c(NA, 0.5))
+    assert_identical(c(NA, 2) % c(0, 1), c(NA, 0))
+    assert_identical(~c(True, NA), c(False, NA))
+    assert_identical(tmp[::-1], c(3, NA, 1))
+    assert_identical(tmp[tmp > 1], c(3))
+    assert_identical(c(tmp, 4), c(1, NA, 3, 4))
+    assert_identical(is_na(tmp[c(0, 2)]), c(False, False))
+    assert_identical(pickle.loads(pickle.dumps(tmp)), tmp)
+    assert_is(pickle.loads(pickle.dumps(NA)), NA)
+    assert_eq(tmp.index(3), 2)
+    assert_eq(tmp.count(1), 1)
+    assert 1 in tmp and NA in tmp and 2 not in tmp
+
     # is_none is both singular and multiple,
     # None is not NA,
     # this is a little different than is.null in R
@@ -250,15 +354,57 @@ if __name__ == "__main__":
     assert_identical(seq(0, 1, length_out=5), vec)
     assert_identical(seq(3, 1), c(3, 2, 1))
 
+    # seq and rep keep their parameters, not their elements
+    big = seq(10 ** 9)
+    assert_eq(len(big), 10 ** 9)
+    assert_eq(big[-1], 10 ** 9)
+    assert_eq(rsum(big), 10 ** 9 * (10 ** 9 + 1) // 2)
+    assert_eq(rmax(big), 10 ** 9)
+    assert_eq(mean(big), 500000000.5)
+    assert_identical(big[10:13], c(11, 12, 13))
+    assert_identical(seq(0, 9)[::-3], c(9, 6, 3, 0))
+    assert_identical(vector(range(3)), c(0, 1, 2))
+    assert_identical(pickle.loads(pickle.dumps(seq(0, 1, 0.25))), vec)
+    big = rep(c(2, 1, 3), each=2, length_out=10 ** 9)
+    assert_eq(big[3], 1)
+    assert_eq(rsum(big), 2 * 10 ** 9 - 2)
+    assert_eq(rmin(big), 1)
+    assert_eq(rsum(rep(v12, times=3)), sum(rep(v12, times=3)))
+    assert_identical(rep(c(1, NA), 2), c(1, NA, 1, NA))
+
     # sort returns a sorted vector
     assert_error(sort, TypeError)
     assert_identical(sort(v213), v123)
+    assert_identical(sort(c(2, NA, 1)), c(1, 2))
+    assert_identical(sort(c(2, NA, 1), na_last=True), c(1, 2, NA))
+    assert_identical(sort(c("b", "c", "a"), decreasing=True), c("c", "b", "a"))
 
     # order returns the sorted indices based on the data
     assert_is(order(), None)
     assert_identical(order(v213), c(1, 0, 2))
     assert_identical(v213[order(v213)], sort(v213))
 
+    # it is stable, puts NA last, first, or drops it,
+    # and breaks ties with any further arguments
+    num = c(2, 1, NA, 2, 1)
+    chr = c("x", "z", "y", NA, "a")
+    assert_identical(order(num), c(1, 4, 0, 3, 2))
+    assert_identical(order(num, na_last=False), c(2, 1, 4, 0, 3))
+    assert_identical(order(num, na_last=None), c(1, 4, 0, 3))
+    assert_identical(order(num, decreasing=True), c(0, 3, 1, 4, 2))
+    assert_identical(order(num, chr), c(4, 1, 0, 3, 2))
+    tmp = order(num, chr, decreasing=(True, False))
+    assert_identical(tmp, c(0, 3, 4, 1, 2))
+    assert_identical(order(chr, num, na_last=None), c(4, 0, 1))
+    assert_identical(order(c(0.5, 0.1, 0.5), num[:3]), c(1, 0, 2))
+    assert_identical(order(c(True, NA, False)), c(2, 0, 1))
+    assert_identical(order(c(10 ** 30, 1, 5)), c(1, 2, 0))
+    assert_identical(order(v213, key=lambda x: -x), c(2, 0, 1))
+    assert_identical(order(v213, reverse=True), c(2, 0, 1))
+    assert_identical(order(c()), vector())
+    assert_error(lambda: order(v123, v12), ValueError)
+    assert_error(lambda: order(c(1, "a")), TypeError)
+
     # paste is useful for joining str vectors...
     assert_identical(paste(), vector())
     assert_identical(paste(0), c("0"))
@@ -272,11 +418,57 @@ if __name__ == "__main__":
     assert_identical(paste(c(0, 1), collapse="."), "0.1")
     assert_identical(paste(0, c(1, 1), collapse="."), "0 1.0 1")
 
+    # ...recycling shorter arguments, NA as "NA",
+    # and it can write lines to a file instead
+    assert_identical(paste(c(1, 2, 3), c("a", "b")), c("1 a", "2 b", "3 a"))
+    assert_identical(paste("a", c(1, NA), "b", sep="_"), c("a_1_b", "a_NA_b"))
+    assert_identical(paste("{}", c(0.5, 1.0), sep=""), c("{}0.5", "{}1.0"))
+    assert_identical(paste("a", c()), c("a "))
+    tmp = io.StringIO()
+    assert_is(paste("row", seq(2), file=tmp), None)
+    paste(c("a", "b"), collapse="+", file=tmp)
+    assert_eq(tmp.getvalue(), "row 1\nrow 2\na+b\n")
+
+    # sprintf formats C-style, recycling the format too
+    assert_identical(sprintf("%d-%s", c(1, 2, NA), "x"), c("1-x", "2-x", NA))
+    assert_identical(sprintf("%05.1f", c(1.25, 2.5)), c("001.2", "002.5"))
+    assert_identical(sprintf(c("%d", "<%d>"), 3), c("3", "<3>"))
+    assert_identical(sprintf("hi"), c("hi"))
+    assert_identical(sprintf("%s", c()), vector())
+    tmp = io.StringIO()
+    sprintf("%.1f", c(0.25, NA), file=tmp)
+    assert_eq(tmp.getvalue(), "0.2\nNA\n")
+    assert_error(lambda: sprintf("%d", "x"), TypeError)
+
     # ifelse works along a vector
     assert_error(ifelse, TypeError)
     assert_identical(v123 > 1, c(False, True, True))
     assert_identical(ifelse(v123 > 1, v123, NA), c(NA, 2, 3))
     assert_identical(ifelse(v123 > 1, 1, 0), c(0, 1, 1))
+    assert_identical(ifelse(c(True, NA, False), 1, 0), c(1, NA, 0))
+    assert_identical(ifelse([True, False], v12, 9), c(1, 9))
+    assert_identical(ifelse(True, "a", "b"), c("a"))
+    assert_error(lambda: ifelse(v123 > 1, v12, 0), ValueError)
+
+    # branches may be lazy or callables of the positions,
+    # and only run on the rows that take them
+    num = c(-4, 0, NA, 9)
+    assert_identical(ifelse(num > 0, sqrt(num.lazy()), NA), c(NA, NA, NA, 3.0))
+    assert_identical(ifelse(num < 0, lambda i: -num[i], num), c(4, 0, NA, 9))
+    assert_identical(ifelse(num > 0, lambda i: len(i), 0), c(0, 0, NA, 1))
+
+    # case_when takes the first true condition, NA if NA comes first
+    assert_error(lambda: case_when(v123 > 1), ValueError)
+    assert_identical(
+        case_when(num < 0, "neg", num == 0, "zero", default="pos"),
+        c("neg", "zero", NA, "pos"),
+    )
+    assert_identical(
+        case_when(num.lazy() < 0, num.lazy() * 2, lambda i: num[i] > 5, -1),
+        c(-8, NA, NA, -1),
+    )
+    assert_identical(case_when(c(NA, True), 1, v12 > 0, 2), c(NA, 1))
+    assert_identical(case_when(v12 > 5, 1, default=v12), c(1, 2))
 
     # match up a vector with an index,
     # NA if not found in index
@@ -289,6 +481,16 @@ if __name__ == "__main__":
     assert_identical(match(v12, v123), c(0, 1))
     assert_identical(match(v123, v12), c(0, 1, NA))
     assert_identical(match(c(1, 2, NA), c(1, NA)), c(0, NA, 1))
+    assert_identical(match(c(2, 1), c(1, 2, 1, 2)), c(1, 0))
+    assert_identical(match(vector(([1], [2])), vector(([2],))), c(NA, 0))
+    assert_identical(match(c(NaN), c(1.0, NaN)), c(1))
+
+    # isin is like %in% from R
+    assert_error(isin, TypeError)
+    assert_identical(isin(v123, v12), c(True, True, False))
+    assert_identical(isin(c(NA, 4), c(4, NA)), c(True, True))
+    assert_identical(isin("a", vstr), c(False))
+    assert_identical(isin(c(NaN, 1.0), c(NaN)), c(True, False))
 
     # which gives the indices of True values
     assert_error(which, TypeError)
@@ -296,6 +498,69 @@ if __name__ == "__main__":
     assert_identical(which(v123 > 1), c(1, 2))
     assert_identical(which(c(True, NA, False, True)), c(0, 3))
 
+    # duplicated flags repeats, table and tabulate count values,
+    # all of them can carry on from earlier chunks
+    num = c(1, 2, NA, 2, 1, NA, 3)
+    tmp = c(False, False, False, True, True, True, False)
+    assert_identical(duplicated(num), tmp)
+    tmp = c(True, True, True, False, False, False, False)
+    assert_identical(duplicated(num, from_last=True), tmp)
+    tmp = set()
+    assert_identical(duplicated(c(1, 2, 2), seen=tmp), c(False, False, True))
+    assert_identical(duplicated(c(2, 3, 3), seen=tmp), c(True, False, True))
+    assert_eq(tmp, {1, 2, 3})
+    assert_eq(table(num), {1: 2, 2: 2, 3: 1})
+    assert_eq(list(table(num, use_na=True)), [1, 2, 3, NA])
+    assert_eq(table(c("b", "a", "b")), {"a": 1, "b": 2})
+    tmp = table(num, c("u", "v", "u", "v", "u", "v", "v"))
+    assert_eq(tmp, {(1, "u"): 2, (2, "v"): 2, (3, "v"): 1})
+    tmp = table(c(1, 1, 2))
+    assert_eq(table(c(2, 3), counts=tmp), {1: 2, 2: 2, 3: 1})
+    assert_identical(tabulate(c(0, 2, 2, NA, 5)), c(1, 0, 2, 0, 0, 1))
+    assert_identical(tabulate(c(0, 2, 2), nbins=2), c(1, 0))
+    tmp = tabulate(c(0, 3))
+    assert_identical(tabulate(c(1, 1), counts=tmp), c(1, 2, 0, 1))
+    assert_error(table, TypeError)
+    # nan is one value, wherever it came from
+    tmp = c(1.0, NaN, NaN)
+    assert_identical(duplicated(tmp), c(False, False, True))
+    assert_identical(duplicated(tmp, from_last=True), c(False, True, False))
+    assert_identical(duplicated(c(float("nan")), seen={NaN}), c(True))
+    assert_eq(table(c(NaN, NaN, 1.0)), {1.0: 1, NaN: 2})
+    assert_eq(list(table(c(NaN, NA, NaN, 1.0), use_na=True)), [1.0, NaN, NA])
+    assert_eq(split(v123, c(NaN, 1.0, NaN)), {1.0: c(2), NaN: c(1, 3)})
+
+    # split and tapply group by hashing one or more index vectors,
+    # rows with an NA key are dropped, NA values make NA groups
+    num = c(1, 2, NA, 4, 5, 6)
+    chr = c("a", "b", "a", "b", NA, "a")
+    assert_eq(split(num, chr), {"a": c(1, NA, 6), "b": c(2, 4)})
+    tmp = split(v123, [c(1, 1, 2), c("x", "y", "x")])
+    assert_eq(tmp, {(1, "x"): c(1), (1, "y"): c(2), (2, "x"): c(3)})
+    assert_eq(tapply(num, chr, rsum), {"a": NA, "b": 6})
+    assert_eq(tapply(num, chr, "sum"), {"a": NA, "b": 6})
+    assert_eq(tapply(num, chr, "sum", na_rm=True), {"a": 7, "b": 6})
+    assert_eq(tapply(num, chr, "mean", na_rm=True), {"a": 3.5, "b": 3.0})
+    assert_eq(tapply(num, chr, "min", na_rm=True), {"a": 1, "b": 2})
+    assert_eq(tapply(num, chr, "max"), {"a": NA, "b": 4})
+    assert_eq(tapply(num, chr, "count"), {"a": 3, "b": 2})
+    assert_eq(tapply(num, chr, "count", na_rm=True), {"a": 2, "b": 2})
+    assert_eq(tapply(num, chr, "var", na_rm=True), {"a": 12.5, "b": 2.0})
+    assert_eq(tapply(c(T, F, T), c(1, 1, 2), "min"), {1: False, 2: True})
+    tmp = tapply(num, [chr, num > 3], "sum")
+    assert_eq(tmp, {("a", False): 1, ("a", True): 6, ("b", False): 2,
+                    ("b", True): 4})
+    assert_eq(tapply(num, chr, len, workers=2), {"a": 3, "b": 2})
+    assert_eq(tapply(v123, [1, 1, 2], rsum), {1: 3, 2: 3})
+    assert_eq(tapply(v123, [1, 1, 2], "sum"), {1: 3, 2: 3})
+    assert_identical(split(v123, [1, 1, 2])[1], v12)
+    assert_eq(tapply(v12, [c(1, 1), c(2, 3)], "sum"), {(1, 2): 1, (1, 3): 2})
+    assert_eq(tapply(v123, ("a", "a", "b"), "sum"), {"a": 3, "b": 3})
+    assert_identical(split(v123, ("a", "a", "b"))["a"], v12)
+    assert_eq(tapply(v12, (c(1, 1), c(2, 3)), rsum), {(1, 2): 1, (1, 3): 2})
+    assert_error(lambda: tapply(num, chr, "median"), ValueError)
+    assert_error(lambda: tapply(num, v12, "sum"), ValueError)
+
     # unique dedupes a vector
     assert_error(which, TypeError)
     assert_identical(unique(rep(v213, times=2)), v213)
@@ -323,6 +588,16 @@ if __name__ == "__main__":
     assert_error(gextrall, TypeError)
     assert_identical(gextrall(ptrn, vstr), vector((c(), rep("a", 2), c("a"))))
 
+    # the regex functions skip NA, and can split the work across processes
+    tmp = c("a rat", NA, "pirate", 42)
+    assert_identical(grepl(ptrn, tmp), c(True, False, True, False))
+    assert_identical(gsub(ptrn, "", tmp), c(" rt", NA, "pirte", "42"))
+    assert_identical(gextr(r"\d", tmp), c(NA, NA, NA, "4"))
+    assert_identical(gextrall(ptrn, tmp)[1], NA)
+    assert_identical(grepl(ptrn, vstr, workers=2), grepl(ptrn, vstr))
+    assert_identical(gsub(ptrn, "", tmp, workers=2, chunksize=1),
+                     gsub(ptrn, "", tmp))
+
     # sqrt is a vectorized sqrt function
     assert_error(sqrt, TypeError)
     assert_eq(sqrt(4), 2)
@@ -386,6 +661,15 @@ if __name__ == "__main__":
     assert_eq(atan(0), 0)
     assert_identical(atan(c(0, NA)), c(0.0, NA))
 
+    # cumulative functions are NA from the first NA on
+    assert_identical(cumsum(v123), c(1, 3, 6))
+    assert_identical(cumsum(c(1.5, NA, 2.0)), c(1.5, NA, NA))
+    assert_identical(cumprod(seq(5)), c(1, 2, 6, 24, 120))
+    assert_identical(cummax(c(1, 3, 2, 5)), c(1, 3, 3, 5))
+    assert_identical(cummin(c(3, 1, 2)), c(3, 1, 1))
+    assert_identical(cumsum(c(T, T, F)), c(1, 2, 2))
+    assert_identical(cumsum(c()), vector())
+
     # STATS TESTS
 
     # na_omit
@@ -402,6 +686,59 @@ if __name__ == "__main__":
     assert_identical(median(v123), 2)
     assert_identical(median(c(1, 2, NA)), NA)
     assert_identical(median(c(1, 2, NA), na_rm=True), 1.5)
+    assert_identical(median(c()), NA)
+    assert_identical(median(c(True, False, True)), True)
+    tmp = seq(9999, 1) * 0.5
+    assert_eq(median(tmp), 2500.0)
+    assert_eq(median(tmp[1:]), 2499.75)
+
+    # quantile, R's nine types, all probabilities from one selection
+    tmp = c(7, 1, 5, 3, 9, 2)
+    assert_identical(quantile(tmp), c(1, 2.25, 4.0, 6.5, 9))
+    assert_eq(
+        [quantile(tmp, 0.4, type=i)[0].__round__(10) for i in range(1, 10)],
+        [3, 3, 2, 2.4, 2.9, 2.8, 3, 2.8666666667, 2.875],
+    )
+    assert_identical(quantile(c(1, NA), 0.5), c(NA))
+    assert_identical(quantile(c(1, NA), 0.5, na_rm=True), c(1))
+    assert_error(lambda: quantile(tmp, 1.5), ValueError)
+    assert_error(lambda: quantile(tmp, type=10), ValueError)
+    tmp = seq(10000) * 1.0
+    tmp = quantile(tmp, (0.1, 0.5, 0.99)).round(10)
+    assert_identical(tmp, c(1000.9, 5000.5, 9900.01))
+    assert_eq(IQR(seq(10)), 4.5)
+    tmp = fivenum(c(1, 2, 3, 4, 5, 6, NA))
+    assert_identical(tmp, c(1.0, 2.0, 3.5, 5.0, 6.0))
+    tmp = summary(c(1, 2, 3, 4, NA))
+    assert_eq(tmp, {"min": 1, "q1": 1.75, "median": 2.5, "mean": 2.5,
+                    "q3": 3.25, "max": 4, "na": 1})
+
+    # selection leaves the global random state alone
+    random.seed(1)
+    tmp = random.random()
+    random.seed(1)
+    median(seq(10000) * 0.5)
+    assert_eq(random.random(), tmp)
+
+    # sketch, approximate quantiles in bounded space, exact while small
+    assert_eq(sketch(c(4, 1, 3, 2)).median(), 2.5)
+    assert_eq(median(c(1, NA), approx=True), NA)
+    assert_eq(median(c(1, NA), na_rm=True, approx=True), 1)
+    tmp = seq(100000) % 1000 * 1.0
+    acc = sketch(tmp)
+    assert_eq((acc.n, acc.min, acc.max), (100000, 0.0, 999.0))
+    assert sum(map(len, acc.levels)) < 3 * acc.k
+    fit = acc.quantile((0, 0.1, 0.5, 0.9, 1))
+    assert_eq((fit[0], fit[4]), (0.0, 999.0))
+    assert all(abs(a - b) < 1000 * 2 / acc.k for a, b in
+               zip(fit, quantile(tmp, (0, 0.1, 0.5, 0.9, 1))))
+    fit = sketch(tmp[:30000]).merge(sketch(tmp[30000:]))
+    assert abs(fit.median() - 499.5) < 1000 * 2 / acc.k
+    fit = sketch.frombytes(acc.tobytes())
+    assert_identical(fit.quantile(), acc.quantile())
+    assert len(acc.tobytes()) < 8 * 4 * acc.k
+    assert_eq(sketch(c(1, NA)).merge(acc).median(), NA)
+    assert_error(lambda: sketch(k=2), ValueError)
 
     # ss, sum of squares
     assert_error(ss, TypeError)
@@ -451,6 +788,49 @@ if __name__ == "__main__":
     assert_eq(cor(v123, v213), 0.5)
     assert_eq(cor(v123, c(1, 2, 3, NA)), NA)
     assert_eq(cor(v123, c(1, 2, 3, NA), na_rm=True), 1)
+    assert_eq(cor(v123, c(3, 2, 1)), -1)
+    assert_eq(cor(v123, c(2, 2, 2)), NA)
+    assert_eq(cov(c(1), c(2)), NA)
+    assert_error(lambda: cor(v123, v12), ValueError)
+
+    # the moments are one pass over blocks, large offsets included
+    tmp = seq(5000) + 1e9
+    assert_eq(var(tmp), 5000 * 5001 / 12)
+    assert_eq(cor(tmp, tmp * -2), -1)
+    assert_eq(sd(c(seq(3000), NA), na_rm=True), sd(seq(3000)))
+
+    # a frame gives the matrix, NA handled as R's use= does
+    tmp = {"a": c(1, 2, 3, 4, 5), "b": c(2, 1, 4, 3, 6),
+           "c": c(5, 3, NA, 1, 0)}
+    assert_eq(cov(tmp)["a"], {"a": 2.5, "b": 2.5, "c": NA})
+    assert_eq(cor(tmp)["b"]["a"], cor(tmp["a"], tmp["b"]))
+    assert_eq(cov(tmp, na_rm=True)["c"]["c"], var(c(5, 3, 1, 0)))
+    assert_eq(cov(tmp, use="complete.obs")["a"]["b"], 10 / 3)
+    fit = cor(tmp, use="pairwise.complete.obs")
+    assert_eq(fit["a"]["b"], cor(tmp["a"], tmp["b"]))
+    assert_eq(fit["c"]["a"], cor(c(1, 2, 4, 5), c(5, 3, 1, 0)))
+    assert_eq(cor({"a": v123, "b": c(2, 2, 2)})["b"], {"a": NA, "b": NA})
+    assert_error(lambda: cor(tmp, use="all"), ValueError)
+
+    # moments and comoments take chunks and merge, and agree with
+    # one pass when the chunks line up with its blocks
+    tmp = seq(5000) * 0.37
+    acc = moments()
+    for i in range(0, 5000, 1024):
+        acc.update(tmp[i:i + 1024])
+    assert_eq((acc.n, acc.var(), acc.max), (5000, var(tmp), rmax(tmp)))
+    acc = moments(v123).merge(moments(c(10, NA), na_rm=True))
+    assert_eq((acc.n, acc.mean, acc.min, acc.max), (4, 4.0, 1, 10))
+    assert_eq(acc.sd(), sd(c(1, 2, 3, 10)))
+    assert_eq(moments(c(1, NA)).merge(moments(v12)).var(), NA)
+    assert_eq(moments().var(), NA)
+    acc = comoments(v12, c(2, 1)).merge(comoments(c(3), c(3)))
+    assert_eq((acc.cov(), acc.cor()), (cov(v123, v213), cor(v123, v213)))
+    assert_eq(comoments(c(1, NA), v12).cor(), NA)
+    # once NA, later chunks are not even read
+    assert_eq(moments(c(1, NA)).update(c("a", "b")).var(), NA)
+    assert_eq(comoments(c(1, NA), v12).update(c("a"), c("b")).cov(), NA)
+    assert_error(lambda: comoments(v123, v12), ValueError)
 
     # mad, median absolute deviation
     assert_error(mad, TypeError)
@@ -460,3 +840,316 @@ if __name__ == "__main__":
     assert_eq(mad(v123, constant=1), 1)
     assert_eq(mad(c(NA, v123)), NA)
     assert_eq(mad(c(NA, v123), na_rm=True), 1.4826)
+    assert_eq(mad(seq(10001) * 2, constant=1), 5000)
+    assert_eq(mad(v123, f=mean, constant=1), 2 / 3)
+
+    # lm and predict, a linear model
+    tmp = lm(v123, v123 * 2 + 1)
+    assert_eq(tmp["coef"], {"b1": 2, "b0": 1})
+    assert_eq((tmp["rss"], tmp["r_squared"], tmp["df"]), (0, 1, 1))
+    assert_identical(predict(tmp, v12), c(3.0, 5.0))
+    assert_eq(predict(tmp, 3), 7.0)
+    assert_eq(predict(tmp["coef"], 3), 7.0)
+
+    # several predictors from a list or a dict, NA rows left out,
+    # standard errors as R gives them, predict by chunks
+    x1 = c(1, 2, 3, 4, 5, 6, NA)
+    x2 = c(2, 1, 4, 3, 6, 5, 0)
+    y = c(3.1, 2.9, 7.2, 6.8, 11.1, 10.9, 1)
+    tmp = lm({"x1": x1, "x2": x2}, y)
+    assert_eq(list(tmp["coef"]), ["b0", "x1", "x2"])
+    assert_eq(round(tmp["coef"]["x2"], 10), 1.1333333333)
+    assert_eq(round(tmp["se"]["x1"], 10), 0.0284637521)
+    assert_eq(round(tmp["se"]["b0"], 10), 0.0643701679)
+    assert_eq((tmp["n"], tmp["df"], round(tmp["sigma"], 10)),
+              (6, 3, 0.0666666667))
+    assert_eq(lm([x1, x2], y)["coef"]["b2"], tmp["coef"]["x2"])
+    fit = predict(tmp, {"x2": x2, "x1": x1})
+    assert_identical(predict(tmp, {"x1": x1, "x2": x2}, chunksize=2), fit)
+    assert_identical(is_na(fit), is_na(x1))
+    assert_error(lambda: lm([v123, v123 * 2], v213), ValueError)
+    assert_error(lambda: lm(v123, v12), ValueError)
+    assert_error(lambda: predict(tmp, v12), ValueError)
+
+    # a model per group, from one scan, the same as fitting each alone;
+    # NA keys are left out, groups that cannot be fit get NA
+    g = c("b", "a", "b", "a", "b", "a", "c", NA)
+    x1, y = c(1, 2, 3, 4, 5, 6, 7, 8), c(2, 1, 6, 9, 9, 13, 0, 0)
+    tmp = lm(x1, y, by=g)
+    assert_eq(list(tmp), ["a", "b", "c"])
+    for k in ("a", "b"):
+        fit = lm(x1[g == k], y[g == k])
+        for a, b in ((tmp[k]["coef"], fit["coef"]), (tmp[k]["se"], fit["se"])):
+            assert abs(a["b0"] - b["b0"]) + abs(a["b1"] - b["b1"]) < 1e-9
+    assert_eq((tmp["c"]["n"], tmp["c"]["coef"]["b1"]), (1, NA))
+    assert_eq(list(lm(x1, y, by=[g, g == "a"])), [("a", True), ("b", False),
+                                                   ("c", False)])
+    tmp = lm(x1[:6], y[:6], by=["a", "a", "a", "b", "b", "b"])
+    assert_eq(tmp["a"]["coef"], lm(x1[:3], y[:3])["coef"])
+    assert_eq(list(lm(x1, y, by=list(g))), ["a", "b", "c"])
+
+    # ZOO TESTS
+
+    from pyrat.zoo import *
+
+    # one value per full window, or padded with fill and aligned,
+    # a window with NA is NA unless na_rm
+    num = c(1, 3, 2, NA, 5, 4, 6, 8)
+    assert_identical(rollsum(num, 3), c(6, NA, NA, NA, 15, 18))
+    tmp = c(NA, 6, 5, 7, 9, 15, 18, NA)
+    assert_identical(rollsum(num, 3, fill=NA, na_rm=True), tmp)
+    tmp = c(NA, NA, 6, 5, 7, 9, 15, 18)
+    assert_identical(rollsum(num, 3, fill=NA, align="right", na_rm=True), tmp)
+    tmp = c(6, NA, NA, NA, 15, 18, NA, NA)
+    assert_identical(rollsum(num, 3, fill=NA, align="left"), tmp)
+    assert_identical(rollsum(v12, 3, fill=NA), c(NA, NA))
+    tmp = c(2.0, 2.5, 3.5, 4.5, 5.0, 6.0)
+    assert_identical(rollmean(num, 3, na_rm=True), tmp)
+    tmp = c(1.0, 0.5, 4.5, 0.5, 1.0, 4.0)
+    assert_identical(rollvar(num, 3, na_rm=True).round(10), tmp)
+    assert_identical(rollsd(num, 3), c(1.0, NA, NA, NA, 1.0, 2.0))
+    assert_identical(rollmin(num, 3, na_rm=True), c(1, 2, 2, 4, 4, 4))
+    assert_identical(rollmax(num, 3), c(3, NA, NA, NA, 6, 8))
+    tmp = c(2, 2.5, 3.5, 4.5, 5, 6)
+    assert_identical(rollmedian(num, 3, na_rm=True), tmp)
+    assert_identical(rollapply(num, 3, rsum), rollsum(num, 3))
+    # inf and nan spoil only the windows they are in
+    tmp = c(1.0, Inf, 2.0, 3.0, 4.0, 5.0, 6.0)
+    assert_identical(rollsum(tmp, 3), c(Inf, Inf, 9.0, 12.0, 15.0))
+    assert_identical(rollmean(tmp, 3), c(Inf, Inf, 3.0, 4.0, 5.0))
+    out = rollvar(tmp, 3)
+    assert_identical(out != out, c(T, T, F, F, F))
+    assert_identical(out[2:], c(1.0, 1.0, 1.0))
+    tmp = c(1.0, NaN, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0)
+    out = rollmedian(tmp, 2)
+    assert_identical(out != out, c(T, T, F, F, F, F, F))
+    assert_identical(out[2:], c(2.5, 3.5, 4.5, 5.5, 6.5))
+    assert_identical(rollsum(tmp, 2)[2:], c(5.0, 7.0, 9.0, 11.0, 13.0))
+    assert_error(lambda: rollsum(num, 0), ValueError)
+    assert_error(lambda: rollsum(num, 2, fill=NA, align="top"), ValueError)
+
+    # the running updates agree with recomputing every window
+    tmp = seq(200) * 0.37 % 5.3
+    for k in (1, 4, 25):
+        for roll, f in ((rollsum, rsum), (rollvar, var), (rollmin, rmin),
+                        (rollmax, rmax), (rollmedian, median)):
+            assert_identical(roll(tmp, k).round(8),
+                             rollapply(tmp, k, f).round(8))
+
+    # BOOT TESTS
+
+    from pyrat.boot import *
+
+    # replicates are fixed by the seed, rows resampled together
+    tmp = seq(50) * 1.0
+    fit = boot(tmp, mean, R=100, seed=1)
+    assert_eq((fit["t0"], len(fit["t"]), fit["R"]), (25.5, 100, 100))
+    assert_identical(boot(tmp, mean, R=100, seed=1)["t"], fit["t"])
+    assert 1 < fit["se"] < 3
+    lo, hi = boot_ci(fit)
+    assert lo < 25.5 < hi
+    lo, hi = boot_ci(fit, type="basic")
+    assert lo < 25.5 < hi
+    lo, hi = boot_ci(fit, conf=0.5, type="norm")
+    assert_eq(round(hi - lo, 10), round(2 * 0.6744897502 * fit["se"], 10))
+    assert_eq(boot(rep(2.0, 10), mean, R=20, seed=1)["se"], 0)
+    fit = boot({"x": tmp, "y": tmp * 2}, lambda d: cor(d["x"], d["y"]), R=20)
+    assert_eq(set(fit["t"].round(10)), {1})
+    assert_error(lambda: boot([v123, v12], len), ValueError)
+    assert_error(lambda: boot_ci(fit, type="bca"), ValueError)
+
+    # the pooled rows dealt out again, or y shuffled against x
+    fit = permutation_test(seq(5), seq(5) + 5, seed=1)
+    assert_eq(fit["t0"], -5)
+    assert fit["p_value"] < 0.05
+    fit = permutation_test(v123, v123, seed=1)
+    assert_eq(fit["p_value"], 1)
+    fit = permutation_test(tmp, tmp % 7 + tmp / 10, f=cor, paired=True,
+                           alternative="greater", R=99, seed=2)
+    assert_eq(fit["p_value"], 0.01)
+    assert_error(lambda: permutation_test(v123, v12, paired=True), ValueError)
+    assert_error(lambda: permutation_test(v123, v12, alternative="two"),
+                 ValueError)
+
+    # UTILS TESTS
+
+    from pyrat.utils import *
+
+    # a file read in chunks of rows has the values of the file read at
+    # once (each chunk is cast on its own), the last chunk short; a file
+    # with only a header has no chunks
+    whole = read_csv("data/mtcars.csv")
+    for size in (10, 32, 100):
+        parts = list(read_csv_chunks("data/mtcars.csv", size))
+        assert_eq([len(x["mpg"]) for x in parts],
+                  [min(size, 32 - i) for i in range(0, 32, size)])
+        assert all(list(x) == list(whole) for x in parts)
+        for k in whole:
+            assert_eq(list(c(*(x[k] for x in parts))), list(whole[k]))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "empty.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("a,b\n")
+        assert_eq(list(read_csv_chunks(path, 5)), [])
+
+    # BACKEND TESTS
+
+    from pyrat.backend import backends, get_backend, set_backend
+
+    # every backend agrees with pure Python to the bit, NA included
+    dbl = c(1.5, -2.0, NA, 4.0, 0.25)
+    num = c(3, -1, 0, NA, 7)
+    lgl = c(True, NA, False, True, False)
+    pos = c(0.5, 2.0, NA, 1.0, 8.0)
+    cases = (
+        lambda: dbl + num, lambda: num - 2, lambda: 2 - dbl,
+        lambda: num * num, lambda: dbl / 4, lambda: num / c(1, 2),
+        lambda: num // c(2, 3), lambda: num % 3, lambda: dbl % 1.5,
+        lambda: num ** 2, lambda: pos ** 0.5, lambda: -num, lambda: abs(dbl),
+        lambda: num == c(3, 1), lambda: dbl < 1, lambda: lgl ^ True,
+        lambda: ~lgl, lambda: lgl + lgl, lambda: num ** -1, lambda: 1 / num,
+        lambda: sqrt(pos), lambda: sqrt(dbl), lambda: exp(dbl),
+        lambda: log(pos), lambda: log10(num), lambda: sin(dbl),
+        lambda: atan(num), lambda: asin(dbl / 4), lambda: which(lgl),
+        lambda: which(num > 0), lambda: order(c(3, 1, 2, 1)),
+        lambda: order(c(2.5, 1.5, 2.5), reverse=True),
+        lambda: sort(c(3, 1, 2)), lambda: sort(c(True, False), reverse=True),
+        lambda: order(num, dbl, decreasing=(True, False)),
+        lambda: order(lgl, na_last=False), lambda: sort(dbl, na_last=True),
+        lambda: ifelse(lgl, num, 0), lambda: ifelse(num > 0, dbl, 0.0),
+        lambda: rsum(num, na_rm=True), lambda: rmin(dbl, na_rm=True),
+        lambda: rmax(lgl, na_rm=True), lambda: mean(pos, na_rm=True),
+        lambda: rsum(na_omit(dbl).lazy() ** 2), lambda: force(num.lazy() * 2),
+        lambda: var(dbl, na_rm=True), lambda: sd(num, na_rm=True),
+        lambda: cor(na_omit(dbl), na_omit(pos)), lambda: median(num),
+        lambda: var(seq(3000) * 0.1), lambda: cov(seq(3000), seq(3000) % 7),
+        lambda: cor(seq(2500) ** 0.5, seq(2500) * 1.5),
+        lambda: quantile(seq(3000) % 17, (0.1, 0.5, 0.9), type=2),
+        lambda: median(seq(2000) * 0.3), lambda: mad(seq(2001) % 13),
+        lambda: rsum(rep(c(T, F, T), length_out=30)),
+        lambda: mean(rep(c(T, F, T), length_out=3000)),
+        lambda: rsum(lgl, na_rm=True), lambda: mean(lgl, na_rm=True),
+        lambda: rsum(seq(5000) ** 0.5), lambda: mean(seq(5000) / 7),
+        lambda: exp(seq(5000) / 1000), lambda: log10(seq(5000) * 1.0),
+        lambda: sin(seq(5000) * 1.0), lambda: seq(5000) ** 1.5,
+        lambda: sqrt(seq(5000) * 1.0),
+        lambda: quantile(rep(c(0, 1, 2), each=3000), (0.1, 0.5, 0.9)),
+        lambda: median(rep(c(0.5, 1.5, 2.5, 3.5), each=2000) * 1),
+    )
+
+    def attempt(f):
+        try:
+            return f()
+        except Exception as err:
+            return type(err)
+
+    set_backend("python")
+    expected = tuple(map(attempt, cases))
+    assert_eq(expected[-13:-9], (20, 2 / 3, 2, 0.5))
+    # heavy ties send the selection back to a full sort
+    assert_identical(expected[-2:], (c(0, 1, 2), 2.0))
+    for name in backends():
+        set_backend(name, threshold=0)
+        for f, exp_ in zip(cases, expected):
+            assert_identical(attempt(f), exp_)
+    set_backend("python")
+    assert_eq(get_backend(), "python")
+    assert_error(lambda: set_backend("fortran"), ValueError)
+
+    # PARALLEL TESTS
+
+    from pyrat import parallel
+
+    # pools are reused, work goes out in chunks, the last call is timed
+    tmp = seq(100) * 1.0
+    assert_identical(c(parallel.pmap(sqrt, tmp, kind="thread")), sqrt(tmp))
+    assert_identical(c(parallel.pmap(operator.add, v123, v123)), v123 * 2)
+    stats = parallel.last_stats()
+    assert_eq(stats["kind"], "process")
+    assert_eq(stats["elements"], 3)
+    assert stats["wall"] >= stats["overhead"] >= 0
+    assert_eq(len(parallel.chunks(tmp, chunksize=30)), 4)
+    assert_eq(parallel.chunks(v123, v213, chunksize=2)[1], (c(3), c(3)))
+    assert_eq(parallel.pstarmap(pow, ((2, 3), (3, 2)), kind="thread"), [8, 9])
+    assert_eq(parallel.configure(chunksize=2)["chunksize"], 2)
+    assert_identical(v123.astype(str).thread(str.isdigit), c(T, T, T))
+    assert_error(lambda: parallel.pmap(abs, v123, kind="fiber"), ValueError)
+
+    # a pool that lost a worker is replaced on the next call
+    assert_error(lambda: parallel.pstarmap(os._exit, [(1,)], workers=2),
+                 concurrent.futures.BrokenExecutor)
+    assert_eq(parallel.pmap(abs, c(-1, 2), workers=2), [1, 2])
+
+    # numbers go to processes through shared memory, other types
+    # and results that change type along the way use pickles
+    tmp = seq(100) * 1.0
+    assert_identical(tmp.proc_map(math.sqrt), sqrt(tmp))
+    assert_identical(v123.proc_map(pow, c(2, 2, 2)), c(1, 4, 9))
+    assert_identical(v123.proc_map(operator.gt, rep(2, 3)), c(F, F, T))
+    assert_identical(c(2, 1).proc_map(max, c(1.0, 2.5)), c(2, 2.5))
+    assert_identical(c(-1.0, 4.0).proc_map(str), c("-1.0", "4.0"))
+    assert_error(lambda: c(4.0, -1.0).proc_map(math.sqrt), ValueError)
+    tmp = parallel.pmap_shared(max, array.array("q", (2, 1)),
+                               array.array("d", (1.0, 2.5)))
+    assert_eq(tmp, [2, 2.5])
+
+    # f runs once per element, whatever types it gives back
+    log = tally.__defaults__[0]
+    assert_identical(seq(0, 99).proc_map(tally), vector(
+        str(x) if x % 2 else x for x in range(100)
+    ))
+    with open(log, encoding="utf-8") as f:
+        assert_eq(sorted(map(int, f)), list(range(100)))
+    os.remove(log)
+
+    # f runs in the workers only, never in the caller
+    tmp = parallel.pmap_shared(double_away, array.array("d", (1.0, 2.5)))
+    assert_eq(list(tmp), [2.0, 5.0])
+    tmp = parallel.pmap_shared(double_away, array.array("q", range(10)),
+                               chunksize=3)
+    assert_eq((tmp.typecode, list(tmp)), ("q", list(range(0, 20, 2))))
+
+    # shared memory is unlinked once, the resource tracker stays quiet
+    tmp = subprocess.run(
+        [sys.executable, "-c", "import math, pyrat.base as b; "
+         "b.seq(100).proc_map(math.sqrt)"],
+        capture_output=True, text=True,
+    )
+    assert_eq((tmp.returncode, tmp.stderr), (0, ""))
+
+    # accumulators reduce across the pool, a chunk per task
+    tmp = seq(1000) * 0.5
+    acc = accumulate(tmp, chunksize=300)
+    assert_eq((acc.n, acc.min, acc.max), (1000, 0.5, 500.0))
+    assert abs(acc.var() - var(tmp)) < 1e-9
+    assert_eq(accumulate(c(1, NA, 3), na_rm=True).mean, 2.0)
+    assert_eq(accumulate(v123, v213, workers=2).cor(), cor(v123, v213))
+    tmp = {k: seq(200) % (i + 3) * 1.0 for i, k in enumerate("abcde")}
+    tmp["c"] = c(NA, tmp["c"][1:])
+    for use in ("everything", "pairwise.complete.obs"):
+        assert_eq(cor(tmp, use=use, workers=2, chunksize=2), cor(tmp, use=use))
+
+    # sketches pickle compactly and merge across processes
+    tmp = seq(20000) * 0.5
+    accs = parallel.pstarmap(sketch, parallel.chunks(tmp, chunksize=5000))
+    acc = sketch()
+    for part in accs:
+        acc.merge(part)
+    assert_eq((acc.n, acc.max), (20000, 10000.0))
+    assert abs(acc.median() - median(tmp)) < 10000 * 2 / acc.k
+
+    # resamples are the same however many workers draw them
+    tmp = seq(40) * 0.5
+    fit = boot(tmp, median, R=30, seed=3)
+    assert_identical(boot(tmp, median, R=30, seed=3, workers=2,
+                          chunksize=7)["t"], fit["t"])
+    fit = permutation_test(tmp, tmp + 1, R=30, seed=3)
+    assert_identical(permutation_test(tmp, tmp + 1, R=30, seed=3,
+                                      workers=2)["t"], fit["t"])
+    tmp = lm(seq(100) * 1.0, seq(100) ** 2, by=seq(100) % 3)
+    fit = lm(seq(100) * 1.0, seq(100) ** 2, by=seq(100) % 3, workers=2,
+             chunksize=30)
+    assert_eq(list(fit), [0, 1, 2])
+    assert all(abs(fit[k]["coef"]["b1"] - tmp[k]["coef"]["b1"]) < 1e-9
+               for k in tmp)
+    parallel.shutdown()